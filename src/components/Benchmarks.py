@@ -0,0 +1,379 @@
+import json
+import os
+import sys
+import threading
+import time
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DINNER_FIXTURE = os.path.join(REPO_ROOT, 'purdue_dinner_2025-09-20.json')
+BENCH_PREFERENCES = {
+    'target_calories': 800,
+    'protein_percentage': 30,
+    'carb_percentage': 40,
+    'fat_percentage': 30,
+    'dietary_restrictions': []
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def time_per_call(func, iterations):
+    func()  # warm-up (lru caches, lazy imports)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def check_fetch_nutrition_http(expected):
+    # The v2 API item recorded for the same dish must give the same nutrition as its rendered page
+    import MenuScrape
+
+    item = json.loads(load_fixture('nutrition_item.api.json'))
+    saved = MenuScrape.http_get_json
+    MenuScrape.http_get_json = lambda url, timeout=15: item
+    try:
+        fetched = MenuScrape.fetch_nutrition_http(f"{MenuScrape.DINING_SITE_URL}/menus/item/{item['ID']}")
+    finally:
+        MenuScrape.http_get_json = saved
+    if fetched != expected:
+        raise AssertionError(f"fetch_nutrition_http output changed: {fetched}")
+
+
+def benchmark_parsing(iterations=200):
+    from MenuScrape import parse_menu_html, parse_nutrition_html
+
+    nutrition_html = load_fixture('nutrition_item.html')
+    menu_html = load_fixture('menu_earhart_lunch.html')
+    expected = json.loads(load_fixture('nutrition_item.expected.json'))
+    parsed = parse_nutrition_html(nutrition_html)
+    if parsed != expected:
+        raise AssertionError(f"parse_nutrition_html output changed: {parsed}")
+    check_fetch_nutrition_http(expected)
+
+    listing = parse_menu_html(menu_html)
+    menu_items = sum(len(items) for _, items in listing)
+    return {
+        'nutrition_parse_us': round(time_per_call(lambda: parse_nutrition_html(nutrition_html), iterations) * 1e6, 1),
+        'menu_parse_us': round(time_per_call(lambda: parse_menu_html(menu_html), iterations) * 1e6, 1),
+        'menu_items': menu_items
+    }
+
+
+def load_dinner_fixture():
+    with open(DINNER_FIXTURE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def benchmark_optimizer(iterations=20):
+    from MealOptimizer import MACRO_FIELDS, get_macro_targets, solve_meal_plans
+
+    dining_data = load_dinner_fixture()
+    courts = {name: data for name, data in dining_data.items() if data.get('total_items', 0) > 0}
+    targets = get_macro_targets(BENCH_PREFERENCES)
+    results = {}
+    for court_name, court_data in courts.items():
+        plans = solve_meal_plans(court_data, BENCH_PREFERENCES)
+        # Mean absolute % miss per macro across the returned plans
+        errors = [
+            abs(plan['totals'][field] - target) / target
+            for plan in plans for field, target in zip(MACRO_FIELDS, targets)
+        ]
+        results[court_name] = {
+            'solve_us': round(time_per_call(lambda: solve_meal_plans(court_data, BENCH_PREFERENCES), iterations) * 1e6, 1),
+            'plans': len(plans),
+            'mean_macro_error_pct': round(100 * sum(errors) / len(errors), 2) if errors else None
+        }
+    return results
+
+
+def benchmark_batch_planning(users=None):
+    import numpy as np
+    from MealOptimizer import BatchPlanner
+
+    users = users or int(os.environ.get('BENCH_USERS', '2000'))
+    rng = np.random.default_rng(0)
+    preferences_list = []
+    for i in range(users):
+        protein = float(rng.integers(15, 41))
+        fat = float(rng.integers(20, 36))
+        preferences_list.append({
+            'target_calories': float(rng.integers(400, 1201)),
+            'protein_percentage': protein,
+            'carb_percentage': 100 - protein - fat,
+            'fat_percentage': fat,
+            'dietary_restrictions': ['vegetarian'] if i % 5 == 0 else []
+        })
+
+    dining_data = load_dinner_fixture()
+    results = {}
+    for court_name, court_data in dining_data.items():
+        if court_data.get('total_items', 0) == 0:
+            continue
+        start = time.perf_counter()
+        planner = BatchPlanner(court_data)
+        prepared = time.perf_counter()
+        planner.plan(preferences_list)
+        finished = time.perf_counter()
+        results[court_name] = {
+            'combinations': len(planner),
+            'menu_prep_us': round((prepared - start) * 1e6, 1),
+            'plan_us': round((finished - prepared) * 1e6, 1),
+            'users_per_sec': round(users / (finished - prepared), 1)
+        }
+    return results
+
+
+def benchmark_query(days=112, iterations=200):
+    import tempfile
+    from datetime import datetime, timedelta
+    from MenuQuery import MenuIndex
+
+    # A semester of files: the dinner fixture re-dated for every day and meal time
+    dining_data = load_dinner_fixture()
+    start = datetime(2025, 8, 25)
+    with tempfile.TemporaryDirectory() as directory:
+        for day in range(days):
+            date = start + timedelta(days=day)
+            for meal_time in ('breakfast', 'lunch', 'dinner'):
+                for court_data in dining_data.values():
+                    court_data['date'] = date.strftime('%Y/%m/%d')
+                    court_data['meal_time'] = meal_time
+                with open(os.path.join(directory, f"purdue_{meal_time}_{date.strftime('%Y-%m-%d')}.json"), 'w', encoding='utf-8') as f:
+                    json.dump(dining_data, f)
+        build_start = time.perf_counter()
+        index = MenuIndex()
+        index.refresh(directory)
+        build_s = time.perf_counter() - build_start
+
+        queries = {
+            'range_court_week_us': lambda: index.query(
+                ranges={'protein_g': (30, None), 'total_calories': (None, 500)},
+                court='Windsor', date_from='2025/09/01', date_to='2025/09/07'
+            ),
+            'text_us': lambda: index.query(text='chicken'),
+            'top_k_us': lambda: index.query(ranges={'total_calories': (None, 500)}, sort_by='protein_g', top_k=10)
+        }
+        results = {'rows': len(index), 'build_s': round(build_s, 3)}
+        for name, query in queries.items():
+            results[name] = round(time_per_call(query, iterations) * 1e6, 1)
+
+        date = start + timedelta(days=days)
+        with open(os.path.join(directory, f"purdue_dinner_{date.strftime('%Y-%m-%d')}.json"), 'w', encoding='utf-8') as f:
+            json.dump(dining_data, f)
+        refresh_start = time.perf_counter()
+        index.refresh(directory)
+        results['incremental_refresh_us'] = round((time.perf_counter() - refresh_start) * 1e6, 1)
+    return results
+
+
+class PeakRssSampler:
+    # Polls the summed resident set size of this process and its descendants (Chrome and chromedriver for the
+    # selenium engine) on a background thread, skipping exclude_pids and their subtrees (e.g. the mock site).
+    # Off Linux it falls back to this process's lifetime peak, which does not include child processes
+    def __init__(self, interval=0.02, exclude_pids=()):
+        self.interval = interval
+        self.exclude_pids = set(exclude_pids)
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def process_rss_bytes(pid):
+        try:
+            with open(f'/proc/{pid}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    @staticmethod
+    def child_pids():
+        # parent pid -> child pids, from /proc/<pid>/stat (the per-task children files need CONFIG_PROC_CHILDREN)
+        children = {}
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f'/proc/{name}/stat', 'r') as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # Field 4 is the parent pid; the command name before it is parenthesized and may contain spaces
+            parent = int(stat.rsplit(')', 1)[1].split()[1])
+            children.setdefault(parent, []).append(int(name))
+        return children
+
+    def current_rss_bytes(self):
+        if not os.path.exists('/proc/self/status'):
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        children = self.child_pids()
+        total = 0
+        pending = [os.getpid()]
+        while pending:
+            pid = pending.pop()
+            if pid in self.exclude_pids:
+                continue
+            total += self.process_rss_bytes(pid)
+            pending.extend(children.get(pid, ()))
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_bytes = self.current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_rss_bytes())
+
+
+def percentile_ms(ordered, fraction):
+    return round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2) if ordered else None
+
+
+def benchmark_end_to_end():
+    import contextlib
+    import io
+    import subprocess
+    import MenuScrape
+    from DriverPool import DriverPool
+    from PerfMetrics import metrics
+
+    # BENCH_E2E_ENGINES: comma-separated scrape engines (http, selenium); BENCH_E2E_CONCURRENCY: per-court worker counts
+    # BENCH_E2E_LATENCY_MS / BENCH_E2E_JITTER_MS / BENCH_E2E_ERROR_RATE / BENCH_E2E_EMPTY_RATE shape the mock site
+    engines = [e.strip() for e in os.environ.get('BENCH_E2E_ENGINES', 'http').split(',') if e.strip()]
+    levels = [int(c) for c in os.environ.get('BENCH_E2E_CONCURRENCY', '1,4,8,16').split(',')]
+    mock_env = dict(
+        os.environ,
+        MOCK_PORT='0',
+        MOCK_LATENCY_MS=os.environ.get('BENCH_E2E_LATENCY_MS', '20'),
+        MOCK_JITTER_MS=os.environ.get('BENCH_E2E_JITTER_MS', '10'),
+        MOCK_ERROR_RATE=os.environ.get('BENCH_E2E_ERROR_RATE', '0'),
+        MOCK_EMPTY_RATE=os.environ.get('BENCH_E2E_EMPTY_RATE', '0')
+    )
+    recording = load_dinner_fixture()
+    meal_time = next(iter(recording.values()))['meal_time']
+    date = next(iter(recording.values()))['date']
+
+    # The mock runs in its own process so its latency sleeps and RSS stay out of the scraper's numbers
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MockDiningSite.py'), DINNER_FIXTURE],
+        stdout=subprocess.PIPE, env=mock_env, text=True
+    )
+    saved = {name: getattr(MenuScrape, name) for name in (
+        'DINING_SITE_URL', 'DINING_API_URL', '_nutrition_cache', '_nutrition_cache_opened', '_http_session', '_http_session_pool_size', '_driver_pool'
+    )}
+    saved_env = {name: os.environ.get(name) for name in ('SCRAPE_HTTP_WORKERS', 'SCRAPE_HTTP_POOL_SIZE')}
+    results = {}
+    try:
+        site = json.loads(mock.stdout.readline())
+        MenuScrape.DINING_SITE_URL = site['url']
+        MenuScrape.DINING_API_URL = site['api_url']
+        # Every item goes over the wire
+        MenuScrape._nutrition_cache, MenuScrape._nutrition_cache_opened = None, True
+        for engine in engines:
+            for workers in levels:
+                os.environ['SCRAPE_HTTP_WORKERS'] = str(workers)
+                # The scrape sizes the session pool from the workers and courts in flight
+                os.environ.pop('SCRAPE_HTTP_POOL_SIZE', None)
+                MenuScrape._http_session, MenuScrape._http_session_pool_size = None, 0
+                if MenuScrape._driver_pool is not None:
+                    MenuScrape._driver_pool.close()
+                MenuScrape._driver_pool = DriverPool(MenuScrape.setup_headless_driver, size=workers) if engine == 'selenium' else None
+                metrics.reset()
+                with PeakRssSampler(exclude_pids=[mock.pid]) as rss, contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    dining_data = MenuScrape.scrape_all_courts_meal_time(meal_time, date, engine)
+                    wall = time.perf_counter() - start
+                items = sum(court.get('total_items', 0) for court in dining_data.values())
+                latencies = sorted(metrics.durations.get('item_fetch', []))
+                run = {
+                    'items': items,
+                    'wall_s': round(wall, 3),
+                    'items_per_sec': round(items / wall, 1),
+                    'item_p50_ms': percentile_ms(latencies, 0.5),
+                    'item_p99_ms': percentile_ms(latencies, 0.99),
+                    'peak_rss_mb': round(rss.peak_bytes / 2 ** 20, 1),
+                    'item_retries': metrics.counters.get('item_retries', 0),
+                    'nutrition_empty': metrics.counters.get('nutrition_empty', 0),
+                    'item_failures': metrics.counters.get('item_failures', 0)
+                }
+                errors = {name: court['error'] for name, court in dining_data.items() if 'error' in court}
+                if errors:
+                    run['errors'] = errors
+                results[f"{engine}_x{workers}"] = run
+    finally:
+        mock.terminate()
+        mock.wait()
+        if MenuScrape._driver_pool is not None and MenuScrape._driver_pool is not saved['_driver_pool']:
+            MenuScrape._driver_pool.close()
+        for name, value in saved.items():
+            setattr(MenuScrape, name, value)
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return results
+
+
+BENCHMARKS = {
+    'parse': benchmark_parsing,
+    'optimizer': benchmark_optimizer,
+    'batch': benchmark_batch_planning,
+    'query': benchmark_query,
+    'e2e': benchmark_end_to_end,
+}
+
+
+def check_regressions(results, baseline, tolerance):
+    # Timings (keys ending in _us, at any depth) may not grow more than tolerance over the baseline
+    regressions = []
+
+    def compare(path, current, base):
+        for key, value in current.items():
+            base_value = base.get(key) if isinstance(base, dict) else None
+            if isinstance(value, dict):
+                compare(f"{path}.{key}", value, base_value or {})
+            elif key.endswith('_us') and base_value and value > base_value * (1 + tolerance):
+                regressions.append(f"{path}.{key}: {value} vs baseline {base_value}")
+
+    for name, metrics in results.items():
+        compare(name, metrics, baseline.get(name, {}))
+    return regressions
+
+
+if __name__ == "__main__":
+    # Usage: python Benchmarks.py [name ...]
+    # BENCH_BASELINE=<results.json> fails the run when a timing regresses by more than BENCH_TOLERANCE (default 0.25)
+    names = sys.argv[1:] or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(2)
+        results[name] = BENCHMARKS[name]()
+    print(json.dumps(results, indent=2))
+
+    baseline_path = os.environ.get('BENCH_BASELINE')
+    if baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = check_regressions(results, baseline, float(os.environ.get('BENCH_TOLERANCE', '0.25')))
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,370 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from MenuScrape import (
+    VALID_MEAL_TIMES,
+    get_output_path,
+    get_todays_date,
+    scrape_all_courts_meal_time,
+    write_meal_output,
+)
+from PerfMetrics import metrics
+from Settings import FALSE_VALUES, TRUE_VALUES, env_flag
+
+# Pre-scrape each meal time shortly before its service window opens
+DEFAULT_SCHEDULE = 'breakfast=06:00,lunch=10:00,dinner=15:30'
+# Longest a query may answer from the index without re-checking output files it did not write itself
+INDEX_REFRESH_INTERVAL = float(os.environ.get('SERVICE_INDEX_REFRESH_S', '5'))
+# JSON-RPC error codes that are not a plain 200 on the HTTP front end
+RPC_HTTP_STATUS = {-32601: 404, -32603: 500}
+
+
+class UnknownMethodError(LookupError):
+    pass
+
+
+def parse_bool(value: str) -> bool:
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES or not value:
+        return False
+    raise ValueError(f"expected a boolean, got '{value}'")
+
+
+# Query-string values arrive as strings; these are converted before dispatch so e.g. ?refresh=false stays false
+GET_PARAM_PARSERS = {
+    'refresh': parse_bool,
+    'descending': parse_bool,
+    'top_k': int,
+    'meal_times': lambda value: [meal.strip() for meal in value.split(',') if meal.strip()],
+    'ranges': json.loads,
+    'preferences': json.loads,
+    'preferences_list': json.loads,
+}
+
+
+def parse_get_params(query: str) -> Dict:
+    params = {key: values[-1] for key, values in parse_qs(query).items()}
+    return {key: GET_PARAM_PARSERS[key](value) if key in GET_PARAM_PARSERS else value for key, value in params.items()}
+
+
+def parse_schedule(value: str) -> List[Tuple[str, int, int]]:
+    # "lunch=10:00,dinner=15:30" -> [('lunch', 10, 0), ('dinner', 15, 30)]
+    schedule = []
+    for entry in value.split(','):
+        if '=' not in entry:
+            continue
+        meal_time, clock = entry.split('=', 1)
+        meal_time = meal_time.strip().lower()
+        if meal_time not in VALID_MEAL_TIMES:
+            continue
+        hour, minute = clock.strip().split(':')
+        schedule.append((meal_time, int(hour), int(minute)))
+    return schedule
+
+
+class DiningService:
+    # Keeps recent menus, the warm driver pool / HTTP session / caches and prepared batch planners in one process
+    def __init__(self, out_dir: Optional[str] = None, engine: Optional[str] = None, max_menus: int = 16, planner_mode: Optional[str] = None,
+                 schedule: Optional[List[Tuple[str, int, int]]] = None):
+        self.out_dir = out_dir
+        self.engine = engine
+        self.max_menus = max_menus
+        self.planner_mode = planner_mode
+        self.schedule = parse_schedule(DEFAULT_SCHEDULE) if schedule is None else schedule
+        self.started_at = time.time()
+        self.menus: 'OrderedDict[Tuple[str, str], Dict]' = OrderedDict()
+        self.next_runs: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._menu_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._batch_planners: Dict[Tuple[str, str, str], Any] = {}
+        self._planner = None
+        # The index has its own lock so a refresh never holds up get_menu/status
+        self._menu_index = None
+        self._index_lock = threading.Lock()
+        self._index_dirty = True
+        self._index_checked_at = 0.0
+        self._index_dir_mtime = None
+
+    def get_menu(self, meal_time: str, date: Optional[str] = None, refresh: bool = False) -> Dict:
+        meal_time = meal_time.lower().strip()
+        if meal_time not in VALID_MEAL_TIMES:
+            raise ValueError(f"Unknown meal time '{meal_time}'")
+        key = (meal_time, date or get_todays_date())
+        with self._lock:
+            if not refresh and key in self.menus:
+                self.menus.move_to_end(key)
+                metrics.count('service_menu_hits')
+                return self.menus[key]
+            menu_lock = self._menu_locks.setdefault(key, threading.Lock())
+        # One scrape per (meal time, date) at a time; concurrent callers wait for it instead of starting their own
+        with menu_lock:
+            with self._lock:
+                if not refresh and key in self.menus:
+                    return self.menus[key]
+            filepath = get_output_path(meal_time, key[1], self.out_dir)
+            if not refresh and os.path.exists(filepath):
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    dining_data = json.load(f)
+            else:
+                with metrics.stage('service_scrape'):
+                    dining_data = scrape_all_courts_meal_time(meal_time, key[1], self.engine)
+                write_meal_output(dining_data, meal_time, key[1], self.out_dir)
+            self._store_menu(key, dining_data)
+            return dining_data
+
+    def _store_menu(self, key: Tuple[str, str], dining_data: Dict) -> None:
+        with self._lock:
+            self.menus[key] = dining_data
+            self.menus.move_to_end(key)
+            self._index_dirty = True
+            for cached_key in [k for k in self._batch_planners if k[:2] == key]:
+                del self._batch_planners[cached_key]
+            while len(self.menus) > self.max_menus:
+                evicted, _ = self.menus.popitem(last=False)
+                for cached_key in [k for k in self._batch_planners if k[:2] == evicted]:
+                    del self._batch_planners[cached_key]
+
+    @property
+    def planner(self):
+        # google.generativeai is only imported if a Gemini-backed planner is actually requested
+        if self._planner is None:
+            from GemeniAIIntegration import GeminiMealPlanner
+            try:
+                self._planner = GeminiMealPlanner(planner_mode=self.planner_mode)
+            except SystemExit:
+                raise RuntimeError("GEMINI_API_KEY is not set; use MEAL_PLANNER_MODE=local") from None
+        return self._planner
+
+    def plan(self, meal_time: str, preferences: Dict, date: Optional[str] = None, court: Optional[str] = None) -> Dict[str, str]:
+        dining_data = self.get_menu(meal_time, date)
+        courts = [
+            (name, data) for name, data in dining_data.items()
+            if data.get('total_items', 0) > 0 and (court is None or name == court)
+        ]
+        planner = self.planner
+        with ThreadPoolExecutor(max_workers=planner.max_concurrency) as executor:
+            results = executor.map(lambda entry: planner.get_meal_recommendations(preferences, entry[1]), courts)
+            return {name: recommendation for (name, _), recommendation in zip(courts, results)}
+
+    def plan_batch(self, meal_time: str, preferences_list: List[Dict], date: Optional[str] = None, top_k: int = 3) -> Dict[str, List[List[Dict]]]:
+        from MealOptimizer import BatchPlanner
+        key = (meal_time.lower().strip(), date or get_todays_date())
+        dining_data = self.get_menu(*key)
+        batch_plans = {}
+        for court_name, court_data in dining_data.items():
+            if court_data.get('total_items', 0) == 0:
+                continue
+            # Combination tables are built once per menu and reused by every later batch request
+            with self._lock:
+                batch_planner = self._batch_planners.get(key + (court_name,))
+            if batch_planner is None:
+                batch_planner = BatchPlanner(court_data)
+                with self._lock:
+                    self._batch_planners[key + (court_name,)] = batch_planner
+            batch_plans[court_name] = batch_planner.plan(preferences_list, top_k=top_k)
+        return batch_plans
+
+    def query(self, params: Dict) -> List[Dict]:
+        # MenuQuery over every output file. refresh() stats every file (~2.5 ms for a semester), so it runs only
+        # when this service stored a menu, a file was added or removed (directory mtime), or INDEX_REFRESH_INTERVAL
+        # passed, which bounds how long an in-place rewrite by another process goes unnoticed
+        from MenuQuery import MenuIndex
+        directory = self.out_dir or '.'
+        with self._index_lock:
+            if self._menu_index is None:
+                self._menu_index = MenuIndex()
+            index = self._menu_index
+            now = time.monotonic()
+            dir_mtime = os.stat(directory).st_mtime_ns
+            with self._lock:
+                dirty, self._index_dirty = self._index_dirty, False
+            if dirty or dir_mtime != self._index_dir_mtime or now - self._index_checked_at >= INDEX_REFRESH_INTERVAL:
+                index.refresh(directory)
+                self._index_dir_mtime = dir_mtime
+                self._index_checked_at = now
+            ranges = {field: tuple(bounds) for field, bounds in (params.get('ranges') or {}).items()}
+            rows = index.query(
+                ranges=ranges, text=params.get('text'), court=params.get('court'), station=params.get('station'),
+                meal_time=params.get('meal_time'), date_from=params.get('date_from'), date_to=params.get('date_to'),
+                top_k=params.get('top_k', 50), sort_by=params.get('sort_by'), descending=params.get('descending', True)
+            )
+            return index.items(rows)
+
+    def prewarm(self, meal_times: Optional[List[str]] = None, date: Optional[str] = None) -> Dict[str, int]:
+        warmed = {}
+        # Defaults to the meal times of the configured schedule
+        for meal_time in meal_times or [meal for meal, _, _ in self.schedule]:
+            dining_data = self.get_menu(meal_time, date, refresh=True)
+            warmed[meal_time] = sum(court.get('total_items', 0) for court in dining_data.values())
+        return warmed
+
+    def status(self) -> Dict:
+        with self._lock:
+            menus = [
+                {'meal_time': meal_time, 'date': date, 'total_items': sum(c.get('total_items', 0) for c in data.values())}
+                for (meal_time, date), data in self.menus.items()
+            ]
+            batch_planners = len(self._batch_planners)
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'menus': menus,
+            'batch_planners': batch_planners,
+            'next_runs': dict(self.next_runs),
+            'metrics': metrics.report()
+        }
+
+    def run_scheduler(self, schedule: List[Tuple[str, int, int]], stop_event: threading.Event) -> None:
+        while not stop_event.is_set():
+            now = datetime.now()
+            runs = []
+            for meal_time, hour, minute in schedule:
+                run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                if run_at <= now:
+                    run_at += timedelta(days=1)
+                runs.append((run_at, meal_time))
+                self.next_runs[meal_time] = run_at.isoformat(timespec='minutes')
+            if not runs:
+                return
+            run_at, meal_time = min(runs)
+            if stop_event.wait((run_at - now).total_seconds()):
+                return
+            print(f"[Service] Pre-warming {meal_time} for {run_at.strftime('%Y/%m/%d')}")
+            try:
+                self.prewarm([meal_time], run_at.strftime('%Y/%m/%d'))
+            except Exception as e:
+                print(f"[Service] Pre-warm of {meal_time} failed: {e}")
+
+    def handle(self, method: str, params: Dict) -> Any:
+        # Shared by the HTTP and stdin JSON-RPC front ends
+        if method == 'menu':
+            return self.get_menu(params['meal_time'], params.get('date'), params.get('refresh', False))
+        if method == 'plan':
+            return self.plan(params['meal_time'], params['preferences'], params.get('date'), params.get('court'))
+        if method == 'plan_batch':
+            return self.plan_batch(params['meal_time'], params['preferences_list'], params.get('date'), params.get('top_k', 3))
+        if method == 'query':
+            return self.query(params)
+        if method == 'prewarm':
+            return self.prewarm(params.get('meal_times'), params.get('date'))
+        if method == 'status':
+            return self.status()
+        raise UnknownMethodError(f"Unknown method '{method}'")
+
+
+def handle_rpc(service: DiningService, request: Dict) -> Dict:
+    # JSON-RPC 2.0 envelope around DiningService.handle
+    response = {'jsonrpc': '2.0', 'id': request.get('id')}
+    try:
+        response['result'] = service.handle(request.get('method', ''), request.get('params') or {})
+    except UnknownMethodError as e:
+        response['error'] = {'code': -32601, 'message': str(e)}
+    except (KeyError, TypeError, ValueError) as e:
+        response['error'] = {'code': -32602, 'message': f"Invalid params: {e}"}
+    except Exception as e:
+        # Anything else failed inside the handler (including an IndexError), not in the request
+        response['error'] = {'code': -32603, 'message': f"Internal error: {e}"}
+    return response
+
+
+def get_http_status(response: Dict) -> int:
+    return RPC_HTTP_STATUS.get(response.get('error', {}).get('code'), 200)
+
+
+def make_http_handler(service: DiningService):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body: Any) -> None:
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            # GET /status, GET /menu?meal_time=lunch[&date=YYYY/MM/DD][&refresh=false], GET /query?text=pizza&top_k=5
+            url = urlsplit(self.path)
+            try:
+                params = parse_get_params(url.query)
+            except ValueError as e:
+                self.send_json(400, {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32602, 'message': f"Invalid params: {e}"}})
+                return
+            response = handle_rpc(service, {'method': url.path.strip('/'), 'params': params})
+            self.send_json(get_http_status(response), response)
+
+        def do_POST(self):
+            # POST /rpc with a JSON-RPC request body
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self.send_json(400, {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}})
+                return
+            response = handle_rpc(service, request)
+            self.send_json(get_http_status(response), response)
+
+    return ServiceHandler
+
+
+def serve_stdio(service: DiningService) -> None:
+    # One JSON-RPC request per line on stdin, one response per line on stdout;
+    # scraper progress prints are redirected to stderr so they never corrupt the stream
+    rpc_out = sys.stdout
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            response = handle_rpc(service, json.loads(line))
+        except ValueError:
+            response = {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}}
+        rpc_out.write(json.dumps(response) + '\n')
+        rpc_out.flush()
+
+
+if __name__ == "__main__":
+    # SERVICE_MODE=http (default) serves on SERVICE_HOST:SERVICE_PORT; SERVICE_MODE=stdio reads JSON-RPC lines from stdin
+    # SERVICE_SCHEDULE: meal=HH:MM pairs to pre-scrape each day (default breakfast=06:00,lunch=10:00,dinner=15:30; empty disables)
+    # SERVICE_PREWARM=1 also scrapes the scheduled meal times for today at startup
+    # SERVICE_MAX_MENUS bounds the (meal time, date) menus kept in memory
+    # SERVICE_INDEX_REFRESH_S: max seconds queries may miss an output file rewritten in place by another process
+    # PERF_MAX_SAMPLES bounds the timing samples kept per stage for the status percentiles (default 10000)
+    # SCRAPE_ENGINE, SCRAPE_OUTPUT_DIR and MEAL_PLANNER_MODE apply as in the CLI tools
+    schedule = parse_schedule(os.environ.get('SERVICE_SCHEDULE', DEFAULT_SCHEDULE))
+    service = DiningService(
+        out_dir=os.environ.get('SCRAPE_OUTPUT_DIR'),
+        engine=os.environ.get('SCRAPE_ENGINE'),
+        max_menus=int(os.environ.get('SERVICE_MAX_MENUS', '16')),
+        schedule=schedule
+    )
+    stop_event = threading.Event()
+    if schedule and env_flag('SERVICE_PREWARM'):
+        threading.Thread(target=service.prewarm, daemon=True).start()
+    threading.Thread(target=service.run_scheduler, args=(schedule, stop_event), daemon=True).start()
+
+    try:
+        if os.environ.get('SERVICE_MODE', 'http').lower() == 'stdio':
+            serve_stdio(service)
+        else:
+            host = os.environ.get('SERVICE_HOST', '127.0.0.1')
+            port = int(os.environ.get('SERVICE_PORT', '8765'))
+            server = ThreadingHTTPServer((host, port), make_http_handler(service))
+            print(f"[Service] Listening on http://{host}:{port}")
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
@@ -0,0 +1,89 @@
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable
+
+
+class DriverPool:
+    def __init__(self, driver_factory: Callable[[], Any], size: int = 4, max_uses: int = 200):
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        # Recycling after max_uses page loads keeps long-lived Chrome processes from leaking memory
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = 0
+        self.recycled = 0
+
+    def acquire(self, timeout: float = None) -> Any:
+        if self._closed:
+            raise RuntimeError("DriverPool is closed")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("Timed out waiting for a pooled driver")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            driver = self.driver_factory()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._uses[id(driver)] = 0
+            self.created += 1
+        return driver
+
+    def release(self, driver: Any, discard: bool = False) -> None:
+        with self._lock:
+            uses = self._uses.get(id(driver), 0) + 1
+            self._uses[id(driver)] = uses
+            retire = discard or self._closed or (self.max_uses and uses >= self.max_uses)
+            if retire:
+                self._uses.pop(id(driver), None)
+                self.recycled += 1
+        if retire:
+            self._quit(driver)
+        else:
+            self._idle.put(driver)
+        self._slots.release()
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except Exception:
+            self.release(driver, discard=not self.is_alive(driver))
+            raise
+        self.release(driver)
+
+    @staticmethod
+    def is_alive(driver: Any) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver: Any) -> None:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._uses.pop(id(driver), None)
+            self._quit(driver)
@@ -1,16 +1,65 @@
 import json
 import os
-import google.generativeai as genai
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+from MealOptimizer import BatchPlanner, format_meal_plans, get_macro_targets, rank_items_by_fit, solve_meal_plans
+from MealStream import iter_dining_data
+from PerfMetrics import PROFILE_SUFFIX, get_perf_path, metrics, profiled, write_perf_report
+from ResponseCache import make_cache_key, open_response_cache
+from Settings import env_flag
+
+PLANNER_MODES = ['gemini', 'local', 'hybrid']
+PROMPT_ITEM_FIELDS = ['name', 'station', 'serving_size', 'total_calories', 'protein_g', 'total_carbs_g', 'dietary_fiber_g', 'cholesterol_mg', 'allergens']
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough 4-characters-per-token estimate; close enough for budgeting prompt size
+    return (len(text) + 3) // 4
+
+
+def normalize_preferences(user_preferences: Dict) -> Dict:
+    return {
+        'target_calories': round(float(user_preferences.get('target_calories', 2000)), 1),
+        'protein_percentage': round(float(user_preferences.get('protein_percentage', 25)), 1),
+        'carb_percentage': round(float(user_preferences.get('carb_percentage', 45)), 1),
+        'fat_percentage': round(float(user_preferences.get('fat_percentage', 30)), 1),
+        'dietary_restrictions': sorted({r.strip().lower() for r in user_preferences.get('dietary_restrictions', []) if r.strip()})
+    }
+
 
 class GeminiMealPlanner:
-    def __init__(self):
+    def __init__(self, planner_mode: Optional[str] = None, model: Any = None):
         load_dotenv()
+        # gemini: LLM builds the plans; local: MealOptimizer only; hybrid: MealOptimizer plans, LLM names them
+        self.planner_mode = (planner_mode or os.getenv('MEAL_PLANNER_MODE', 'gemini')).lower()
+        if self.planner_mode not in PLANNER_MODES:
+            self.planner_mode = 'gemini'
+        self.max_concurrency = max(1, int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')))
+        self.max_retries = int(os.getenv('GEMINI_MAX_RETRIES', '3'))
+        self.request_timeout = float(os.getenv('GEMINI_TIMEOUT', '60'))
+        self.backoff_base = float(os.getenv('GEMINI_BACKOFF_BASE', '1.0'))
+        # Opt-in prompt compaction: keep the top-K items by macro fit, then trim to the token budget (0, the default,
+        # disables either). Off by default the model sees the whole menu and applies the dietary restrictions itself
+        self.prompt_top_k = int(os.getenv('GEMINI_PROMPT_TOP_K', '0'))
+        self.prompt_token_budget = int(os.getenv('GEMINI_PROMPT_TOKEN_BUDGET', '0'))
+        self.response_cache = open_response_cache()
+        # Any object with generate_content(prompt, **kwargs) returning something with .text works,
+        # which lets the planner run against a local fake model
+        self.model = model
+        if model is not None:
+            return
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
+            if self.planner_mode == 'local':
+                return
             print("❌ Error: Please set GEMINI_API_KEY in .env file")
             exit()
+        # Imported only when a real Gemini client is needed; local mode and injected models skip it
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
 
@@ -18,6 +67,10 @@ class GeminiMealPlanner:
         with open(json_file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
 
+    def iter_dining_data(self, json_file_path: str) -> Iterator[Tuple[str, Dict]]:
+        # Lazy counterpart to load_dining_data: reads a streamed .jsonl one court at a time
+        return iter_dining_data(json_file_path)
+
     def format_food_data_for_ai(self, court_data: Dict) -> str:
         formatted_text = f"Dining Court: {court_data.get('dining_court', 'Unknown')}\n\n"
         for station_name, items in court_data.get('stations', {}).items():
@@ -30,13 +83,56 @@ class GeminiMealPlanner:
                 fiber = item.get('dietary_fiber_g', 'N/A')
                 cholesterol = item.get('cholesterol_mg', 'N/A')
                 serving = item.get('serving_size', 'N/A')
+                allergens = f" [allergens: {', '.join(item['allergens'])}]" if item.get('allergens') else ""
                 formatted_text += (
                     f"  - {name} ({serving}): {calories} cal, {protein}g protein, "
-                    f"{carbs}g carbs, {fiber}g fiber, {cholesterol}mg cholesterol\n"
+                    f"{carbs}g carbs, {fiber}g fiber, {cholesterol}mg cholesterol{allergens}\n"
                 )
             formatted_text += "\n"
         return formatted_text
 
+    def compact_court_data(self, court_data: Dict, user_preferences: Dict) -> Dict:
+        if self.prompt_top_k <= 0 and self.prompt_token_budget <= 0:
+            return court_data
+        items = [item for station_items in court_data.get('stations', {}).values() for item in station_items]
+        # Ranked by macro fit only: the restrictions go to the model in the prompt, since the name-based
+        # filter would silently drop items the model could judge better
+        keep = rank_items_by_fit(items, {**user_preferences, 'dietary_restrictions': []})
+        if self.prompt_top_k > 0:
+            keep = keep[:self.prompt_top_k]
+
+        def build(kept):
+            kept_ids = {id(items[i]) for i in kept}
+            stations = {}
+            for station_name, station_items in court_data.get('stations', {}).items():
+                selected = [item for item in station_items if id(item) in kept_ids]
+                if selected:
+                    stations[station_name] = selected
+            return {**court_data, 'stations': stations, 'total_items': len(kept)}
+
+        compacted = build(keep)
+        while self.prompt_token_budget > 0 and len(keep) > 1 and \
+                estimate_tokens(self.format_food_data_for_ai(compacted)) > self.prompt_token_budget:
+            keep = keep[:len(keep) - max(1, len(keep) // 10)]
+            compacted = build(keep)
+        return compacted
+
+    def response_cache_key(self, user_preferences: Dict, court_data: Dict) -> str:
+        # Same preferences + same item set (in any order) + same model/compaction settings -> same response
+        item_set = sorted(
+            json.dumps([item.get(field) for field in PROMPT_ITEM_FIELDS])
+            for station_items in court_data.get('stations', {}).values() for item in station_items
+        )
+        return make_cache_key({
+            'model': getattr(self.model, 'model_name', type(self.model).__name__),
+            'mode': self.planner_mode,
+            'preferences': normalize_preferences(user_preferences),
+            'court': court_data.get('dining_court'),
+            'items': item_set,
+            'top_k': self.prompt_top_k,
+            'token_budget': self.prompt_token_budget
+        })
+
     def create_meal_plan_prompt(self, user_preferences: Dict, court_food_data: str) -> str:
         target_calories = user_preferences.get('target_calories', 2000)
         protein_percentage = user_preferences.get('protein_percentage', 25)
@@ -44,9 +140,7 @@ class GeminiMealPlanner:
         fat_percentage = user_preferences.get('fat_percentage', 30)
         dietary_restrictions = user_preferences.get('dietary_restrictions', [])
         
-        target_protein = int((target_calories * protein_percentage / 100) / 4)
-        target_carbs = int((target_calories * carb_percentage / 100) / 4)
-        target_fat = int((target_calories * fat_percentage / 100) / 9)
+        _, target_protein, target_carbs, target_fat = (int(v) for v in get_macro_targets(user_preferences))
         restrictions_text = ", ".join(dietary_restrictions) if dietary_restrictions else "None"
 
         prompt = f"""
@@ -87,38 +181,115 @@ class GeminiMealPlanner:
         """
         return prompt
 
+    def generate_with_retry(self, prompt: str) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.stage('gemini_request'):
+                    response = self.model.generate_content(prompt, request_options={'timeout': self.request_timeout})
+                    return response.text
+            except Exception:
+                if attempt == self.max_retries:
+                    metrics.count('gemini_failures')
+                    raise
+                metrics.count('gemini_retries')
+                # Exponential backoff with full jitter so concurrent courts don't retry in lockstep
+                time.sleep(random.uniform(0, min(30.0, self.backoff_base * 2 ** attempt)))
+
+    def describe_meal_plans(self, plans: List[Dict], court_name: str) -> Optional[List[Dict]]:
+        plan_lines = []
+        for i, plan in enumerate(plans, 1):
+            items = ", ".join(f"{item['servings']} x {item['name']}" for item in plan['items'])
+            plan_lines.append(f"{i}. {items}")
+        prompt = (
+            f"Give each of these {court_name} dining court meal plans a short creative name and a "
+            f"one-sentence description. Do not change the foods.\n" + "\n".join(plan_lines) +
+            '\nRespond with only a JSON list like [{"name": "...", "description": "..."}].'
+        )
+        try:
+            response_text = self.generate_with_retry(prompt)
+            match = re.search(r'\[.*\]', response_text, re.DOTALL)
+            return json.loads(match.group(0)) if match else None
+        except Exception:
+            return None
+
     def get_meal_recommendations(self, user_preferences: Dict, court_data: Dict) -> str:
-        food_data_text = self.format_food_data_for_ai(court_data)
-        prompt = self.create_meal_plan_prompt(user_preferences, food_data_text)
+        with metrics.stage('meal_recommendations'):
+            return self._get_meal_recommendations(user_preferences, court_data)
+
+    def _get_meal_recommendations(self, user_preferences: Dict, court_data: Dict) -> str:
+        cache_key = None
+        if self.response_cache is not None and self.model is not None and self.planner_mode != 'local':
+            cache_key = self.response_cache_key(user_preferences, court_data)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                metrics.count('response_cache_hits')
+                return cached
+            metrics.count('response_cache_misses')
+        if self.planner_mode in ('local', 'hybrid'):
+            # Plans are solved locally against the scraped numbers; the LLM only names them
+            with metrics.stage('local_solve'):
+                plans = solve_meal_plans(court_data, user_preferences)
+            descriptions = None
+            if plans and self.planner_mode == 'hybrid' and self.model is not None:
+                descriptions = self.describe_meal_plans(plans, court_data.get('dining_court', 'Unknown'))
+            recommendation = format_meal_plans(plans, descriptions, user_preferences.get('dietary_restrictions'))
+            if cache_key and descriptions:
+                self.response_cache.put(cache_key, recommendation)
+            return recommendation
+        with metrics.stage('prompt_build'):
+            food_data_text = self.format_food_data_for_ai(self.compact_court_data(court_data, user_preferences))
+            prompt = self.create_meal_plan_prompt(user_preferences, food_data_text)
+        metrics.count('prompt_tokens', estimate_tokens(prompt))
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            recommendation = self.generate_with_retry(prompt)
         except Exception as e:
             return f"Error calling Gemini API: {e}"
+        if cache_key:
+            self.response_cache.put(cache_key, recommendation)
+        return recommendation
+
+    def generate_batch_plans(self, dining_data: Dict, preferences_list: List[Dict], top_k: int = 3) -> Dict[str, List[List[Dict]]]:
+        # Many users against one menu: each court's combinations are built once and every user is scored together
+        batch_plans = {}
+        for court_name, court_data in dining_data.items():
+            if court_data.get('total_items', 0) > 0:
+                batch_plans[court_name] = BatchPlanner(court_data).plan(preferences_list, top_k=top_k)
+        return batch_plans
 
     def generate_all_court_recommendations(self, json_file_path: str, user_preferences: Dict, output_file: str) -> None:
-        dining_data = self.load_dining_data(json_file_path)
+        print("🤖 Generating AI meal plan recommendations for all courts...")
+        # Courts are requested concurrently but written in file order, so output stays deterministic.
+        # Each court is submitted as soon as it is read, so planning starts before the whole file is parsed
+        courts = []
+        recommendations = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            future_to_court = {}
+            for court_name, court_data in self.iter_dining_data(json_file_path):
+                if court_data.get('total_items', 0) == 0:
+                    print(f"   ⚠️ Skipping {court_name} (no food data)")
+                    continue
+                courts.append(court_name)
+                print(f"   Generating plans for {court_name}...")
+                future = executor.submit(self.get_meal_recommendations, user_preferences, court_data)
+                future_to_court[future] = court_name
+            for future in as_completed(future_to_court):
+                court_name = future_to_court[future]
+                recommendations[court_name] = future.result()
+                print(f"   ✅ {court_name} complete")
 
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write("PURDUE DINING MEAL PLAN RECOMMENDATIONS\n")
             f.write("=" * 50 + "\n\n")
+            for court_name in courts:
+                f.write(f"🏛️ {court_name.upper()} DINING COURT\n")
+                f.write("-" * 40 + "\n")
+                f.write(recommendations[court_name])
+                f.write("\n\n" + "=" * 50 + "\n\n")
 
-            print("🤖 Generating AI meal plan recommendations for all courts...")
-
-            for court_name, court_data in dining_data.items():
-                if court_data.get('total_items', 0) > 0:
-                    print(f"   Generating plans for {court_name}...")
-
-                    recommendation = self.get_meal_recommendations(user_preferences, court_data)
-
-                    f.write(f"🏛️ {court_name.upper()} DINING COURT\n")
-                    f.write("-" * 40 + "\n")
-                    f.write(recommendation)
-                    f.write("\n\n" + "=" * 50 + "\n\n")
-
-                    print(f"   ✅ {court_name} complete")
-                else:
-                    print(f"   ⚠️ Skipping {court_name} (no food data)")
+        extra = {'planner_mode': self.planner_mode, 'courts': courts}
+        if self.response_cache is not None:
+            extra['response_cache'] = self.response_cache.stats()
+        print(f"📊 Timing report saved to {write_perf_report(output_file, extra)}")
 
 def main():
     print("🍽️ AI-Powered Meal Plan Generator (Gemini)")
@@ -156,7 +327,13 @@ def main():
         planner = GeminiMealPlanner()
 
         output_file = "meal_recommendations.txt"
-        planner.generate_all_court_recommendations(json_file, user_preferences, output_file)
+        # GEMINI_PROMPT_TOP_K / GEMINI_PROMPT_TOKEN_BUDGET opt in to pruning the menu sent to the model (0 = whole menu)
+        # GEMINI_PROFILE=1 also writes a cProfile dump (meal_recommendations.prof) for deep dives
+        profile_path = None
+        if env_flag('GEMINI_PROFILE'):
+            profile_path = get_perf_path(output_file, PROFILE_SUFFIX)
+        with profiled(profile_path):
+            planner.generate_all_court_recommendations(json_file, user_preferences, output_file)
 
         print(f"📄 Recommendations saved to {output_file}")
 
@@ -0,0 +1,389 @@
+import os
+import re
+from itertools import combinations, product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MACRO_FIELDS = ['total_calories', 'protein_g', 'total_carbs_g', 'total_fat_g']
+# Calories and protein drive the fit; carbs and fat are softer
+MACRO_WEIGHTS = np.array([1.5, 1.2, 0.8, 0.8])
+# Items a BatchPlanner combines; combinations grow with the cube of this (60 items -> ~280k combinations)
+MAX_CANDIDATES = int(os.environ.get('MEAL_PLANNER_MAX_CANDIDATES', '60'))
+
+MEAT_WORDS = [
+    'chicken', 'beef', 'pork', 'turkey', 'ham', 'bacon', 'sausage', 'pepperoni', 'salami', 'steak',
+    'meatball', 'meatloaf', 'meat', 'lamb', 'brisket', 'chorizo', 'gyro', 'wings', 'hot dog', 'bratwurst',
+    'hamburger', 'cheeseburger', 'pastrami', 'prosciutto', 'gelatin'
+]
+SEAFOOD_WORDS = ['fish', 'salmon', 'tuna', 'shrimp', 'cod', 'tilapia', 'pollock', 'catfish', 'crab', 'seafood']
+DAIRY_WORDS = ['cheese', 'milk', 'butter', 'cream', 'yogurt', 'alfredo', 'queso', 'ranch', 'parmesan', 'parm', 'mozzarella']
+# Dishes whose names don't say they are made with egg or dairy
+EGG_DAIRY_DISH_WORDS = [
+    'french toast', 'pancake', 'waffle', 'omelet', 'omelette', 'quiche', 'frittata', 'scrambled', 'relleno',
+    'pizza', 'lasagna', 'quesadilla', 'nacho', 'macaroni', 'custard', 'pudding', 'cheesecake', 'meringue',
+    'carbonara', 'souffle', 'brownie', 'cookie', 'cake', 'muffin', 'aioli', 'whey', 'casein'
+]
+RESTRICTION_KEYWORDS = {
+    'vegetarian': MEAT_WORDS + SEAFOOD_WORDS,
+    'vegan': MEAT_WORDS + SEAFOOD_WORDS + DAIRY_WORDS + EGG_DAIRY_DISH_WORDS + ['egg', 'honey', 'mayo', 'mayonnaise'],
+    'pescatarian': MEAT_WORDS,
+    'halal': ['pork', 'ham', 'bacon', 'sausage', 'pepperoni', 'salami', 'chorizo'],
+    'no pork': ['pork', 'ham', 'bacon', 'sausage', 'pepperoni', 'salami', 'chorizo'],
+    'dairy free': DAIRY_WORDS,
+    'lactose intolerant': DAIRY_WORDS,
+    'gluten free': [
+        'bread', 'bun', 'pasta', 'pizza', 'breaded', 'tortilla', 'cake', 'cookie', 'noodle', 'biscuit',
+        'waffle', 'pancake', 'muffin', 'roll', 'bagel', 'cracker', 'wrap', 'crouton', 'brownie', 'spaghetti'
+    ],
+    'nut free': ['peanut', 'almond', 'cashew', 'pecan', 'walnut', 'pistachio', 'hazelnut'],
+    'shellfish free': ['shrimp', 'crab', 'lobster', 'clam', 'scallop'],
+}
+# Allergens published with an item's nutrition that rule it out regardless of its name
+RESTRICTION_ALLERGENS = {
+    'vegetarian': ['fish', 'shellfish'],
+    'vegan': ['milk', 'eggs', 'egg', 'fish', 'shellfish'],
+    'dairy free': ['milk'],
+    'lactose intolerant': ['milk'],
+    'gluten free': ['wheat', 'gluten'],
+    'nut free': ['peanuts', 'peanut', 'tree nuts', 'tree nut'],
+    'shellfish free': ['shellfish'],
+}
+RESTRICTION_DISCLAIMER = (
+    "Note: dietary restrictions are applied best-effort from item names and any published ingredients/allergens; "
+    "they are not guaranteed. Check the allergen information at the dining court before eating."
+)
+
+
+def get_macro_targets(user_preferences: Dict) -> np.ndarray:
+    target_calories = user_preferences.get('target_calories', 2000)
+    protein_percentage = user_preferences.get('protein_percentage', 25)
+    carb_percentage = user_preferences.get('carb_percentage', 45)
+    fat_percentage = user_preferences.get('fat_percentage', 30)
+    return np.array([
+        target_calories,
+        (target_calories * protein_percentage / 100) / 4,
+        (target_calories * carb_percentage / 100) / 4,
+        (target_calories * fat_percentage / 100) / 9
+    ], dtype=np.float64)
+
+
+def compile_restriction(restriction: str) -> Optional[re.Pattern]:
+    restriction = restriction.strip().lower()
+    if not restriction:
+        return None
+    words = RESTRICTION_KEYWORDS.get(restriction)
+    if words is None:
+        # Free-form entries such as "no mushrooms" or "peanut free" exclude that word
+        word = re.sub(r'^(no|without)\s+|\s+(free|allergy)$', '', restriction).strip()
+        words = [word.rstrip('s')] if word else []
+    if not words:
+        return None
+    # Whole words only (with plurals), so "ham" does not match "Graham" nor "egg" match "Eggplant"
+    return re.compile(r'\b(?:' + '|'.join(re.escape(w) for w in words) + r')(?:s|es)?\b')
+
+
+def get_item_restriction_text(item: Dict) -> str:
+    # Name plus the ingredients and allergens scraped with the nutrition, when present. Their scraping is unverified
+    # against the live site (see MenuScrape.parse_nutrition_html), so most items may be matched on the name alone
+    allergens = item.get('allergens') or []
+    return ' | '.join([str(item.get('name', '')), str(item.get('ingredients') or ''), ', '.join(allergens)]).lower()
+
+
+class MenuMatrix:
+    # Items with usable nutrition for one court, as an items x MACRO_FIELDS matrix
+    def __init__(self, items: List[Dict]):
+        self.items = items
+        self.macros = np.array(
+            [[float(item.get(field) or 0.0) for field in MACRO_FIELDS] for item in items],
+            dtype=np.float64
+        ).reshape(len(items), len(MACRO_FIELDS))
+        self._texts = [get_item_restriction_text(item) for item in items]
+        self._allergens = [[str(a).strip().lower() for a in item.get('allergens') or []] for item in items]
+
+    @classmethod
+    def from_court_data(cls, court_data: Dict) -> 'MenuMatrix':
+        items = []
+        seen = set()
+        for station_name, station_items in court_data.get('stations', {}).items():
+            for item in station_items:
+                # Items scraped without calories can't be planned around
+                if not item.get('total_calories') or item.get('name') in seen:
+                    continue
+                seen.add(item.get('name'))
+                items.append({**item, 'station': item.get('station', station_name)})
+        return cls(items)
+
+    def allowed_mask(self, dietary_restrictions: List[str]) -> np.ndarray:
+        mask = np.ones(len(self.items), dtype=bool)
+        for restriction in dietary_restrictions or []:
+            pattern = compile_restriction(restriction)
+            excluded = set(RESTRICTION_ALLERGENS.get(restriction.strip().lower(), ()))
+            if pattern is not None:
+                mask &= np.array([not pattern.search(text) for text in self._texts], dtype=bool)
+            if excluded:
+                mask &= np.array([not excluded.intersection(allergens) for allergens in self._allergens], dtype=bool)
+        return mask
+
+
+def select_candidates(menu: MenuMatrix, max_candidates: int) -> List[int]:
+    # Indices of up to max_candidates items, taken in turn from the most calorie-dense and the items with
+    # the largest protein, carb and fat share of their calories, so every kind of target keeps its building blocks
+    n_items = len(menu.items)
+    if not max_candidates or n_items <= max_candidates:
+        return list(range(n_items))
+    calories = menu.macros[:, 0]
+    split = menu.macros[:, 1:] * np.array([4.0, 4.0, 9.0]) / np.maximum(calories, 1.0)[:, None]
+    rankings = [np.argsort(-calories, kind='stable')] + [np.argsort(-split[:, j], kind='stable') for j in range(split.shape[1])]
+    chosen = []
+    seen = set()
+    for rank in range(n_items):
+        for ranking in rankings:
+            item = int(ranking[rank])
+            if item not in seen:
+                seen.add(item)
+                chosen.append(item)
+                if len(chosen) == max_candidates:
+                    return sorted(chosen)
+    return sorted(chosen)
+
+
+def rank_items_by_fit(items: List[Dict], user_preferences: Dict) -> List[int]:
+    # Indices of allowed items, best first, by how closely each item's calorie split
+    # (protein/carbs/fat) matches the target split; items without calories go last
+    menu = MenuMatrix(items)
+    allowed = menu.allowed_mask(user_preferences.get('dietary_restrictions', []))
+    target_split = np.array([
+        user_preferences.get('protein_percentage', 25),
+        user_preferences.get('carb_percentage', 45),
+        user_preferences.get('fat_percentage', 30)
+    ], dtype=np.float64) / 100
+    calories = menu.macros[:, 0]
+    split = menu.macros[:, 1:] * np.array([4.0, 4.0, 9.0]) / np.maximum(calories, 1.0)[:, None]
+    distance = np.abs(split - target_split).sum(axis=1)
+    distance[calories <= 0] = np.inf
+    order = np.argsort(distance, kind='stable')
+    return [int(i) for i in order if allowed[i]]
+
+
+def plan_loss(totals: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    # Weighted relative distance from the targets, vectorized over the leading axes of totals
+    return (np.abs(totals - targets) / np.maximum(targets, 1.0) * MACRO_WEIGHTS).sum(axis=-1)
+
+
+def beam_search(macros: np.ndarray, targets: np.ndarray, max_items: int = 5, max_servings: int = 2, beam_width: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+    # Grows plans one serving at a time, keeping the beam_width closest distinct plans at each step.
+    # Returns every plan visited (servings per item) with its loss.
+    n_items = macros.shape[0]
+    counts = np.zeros((1, n_items), dtype=np.int16)
+    totals = np.zeros((1, len(targets)))
+    visited_counts = []
+    visited_loss = []
+    for _ in range(max_items * max_servings):
+        candidate_totals = totals[:, None, :] + macros[None, :, :]
+        loss = plan_loss(candidate_totals, targets)
+        distinct = (counts > 0).sum(axis=1)
+        invalid = (counts >= max_servings) | ((counts == 0) & (distinct[:, None] >= max_items))
+        loss[invalid] = np.inf
+        flat = loss.ravel()
+        keep = min(beam_width * 4, int(np.isfinite(flat).sum()))
+        if keep == 0:
+            break
+        best = np.argpartition(flat, keep - 1)[:keep]
+        best = best[np.argsort(flat[best], kind='stable')]
+        parent, item = np.divmod(best, n_items)
+        new_counts = counts[parent].copy()
+        new_counts[np.arange(len(best)), item] += 1
+        # The same basket is reachable in several orders; keep its first (lowest-loss) occurrence
+        _, first = np.unique(new_counts, axis=0, return_index=True)
+        first = np.sort(first)[:beam_width]
+        counts = new_counts[first]
+        totals = candidate_totals[parent[first], item[first]]
+        visited_counts.append(counts)
+        visited_loss.append(flat[best[first]])
+    if not visited_counts:
+        return np.zeros((0, n_items), dtype=np.int16), np.zeros(0)
+    return np.concatenate(visited_counts), np.concatenate(visited_loss)
+
+
+def build_plan(menu: MenuMatrix, servings: List[Tuple[int, int]], totals: np.ndarray, loss: float) -> Dict:
+    # servings: (item index, servings) pairs, main item first
+    plan_items = []
+    for item_index, count in servings:
+        item = menu.items[item_index]
+        plan_items.append({
+            'name': item.get('name'),
+            'station': item.get('station'),
+            'serving_size': item.get('serving_size', 'N/A'),
+            'servings': count
+        })
+    return {
+        'name': f"{plan_items[0]['name']} Plate",
+        'items': plan_items,
+        'totals': {field: round(float(value), 1) for field, value in zip(MACRO_FIELDS, totals)},
+        'score': round(float(loss), 4)
+    }
+
+
+def solve_meal_plans(court_data: Dict, user_preferences: Dict, num_plans: int = 3, max_items: int = 5,
+                     max_servings: int = 2, beam_width: int = 256, max_overlap: float = 0.5) -> List[Dict]:
+    menu = MenuMatrix.from_court_data(court_data)
+    allowed = np.nonzero(menu.allowed_mask(user_preferences.get('dietary_restrictions', [])))[0]
+    if len(allowed) == 0:
+        return []
+    targets = get_macro_targets(user_preferences)
+    counts, loss = beam_search(menu.macros[allowed], targets, max_items, max_servings, beam_width)
+    order = np.argsort(loss, kind='stable')
+
+    plans = []
+    chosen_sets = []
+    chosen_anchors = set()
+    for index in order:
+        item_set = set(np.nonzero(counts[index])[0].tolist())
+        ranked = sorted(item_set, key=lambda i: -menu.macros[allowed[i], 0] * counts[index, i])
+        # Keep the plans varied: each is built around a different main item and shares
+        # at most max_overlap of its items with an earlier pick
+        if ranked[0] in chosen_anchors:
+            continue
+        if any(len(item_set & other) / len(item_set | other) > max_overlap for other in chosen_sets):
+            continue
+        chosen_sets.append(item_set)
+        chosen_anchors.add(ranked[0])
+        totals = counts[index].astype(np.float64) @ menu.macros[allowed]
+        plans.append(build_plan(menu, [(int(allowed[i]), int(counts[index, i])) for i in ranked], totals, loss[index]))
+        if len(plans) == num_plans:
+            break
+    return plans
+
+
+class BatchPlanner:
+    # Enumerates every combination of up to max_items items (1..max_servings servings each) once per
+    # menu, then scores many users' targets against all of them in vectorized chunks. Menus larger than
+    # max_candidates items are first narrowed with select_candidates
+    def __init__(self, court_data: Dict, max_items: int = 3, max_servings: int = 2, max_candidates: int = MAX_CANDIDATES):
+        menu = MenuMatrix.from_court_data(court_data)
+        candidates = select_candidates(menu, max_candidates)
+        self.menu = menu if len(candidates) == len(menu.items) else MenuMatrix([menu.items[i] for i in candidates])
+        n_items = len(self.menu.items)
+        combo_items = []
+        combo_servings = []
+        for size in range(1, min(max_items, n_items) + 1):
+            index_sets = np.array(list(combinations(range(n_items), size)), dtype=np.int32)
+            serving_sets = np.array(list(product(range(1, max_servings + 1), repeat=size)), dtype=np.int16)
+            # Every index set paired with every servings pattern, padded to max_items with -1 / 0
+            items = np.repeat(index_sets, len(serving_sets), axis=0)
+            servings = np.tile(serving_sets, (len(index_sets), 1))
+            pad = max_items - size
+            combo_items.append(np.pad(items, ((0, 0), (0, pad)), constant_values=-1))
+            combo_servings.append(np.pad(servings, ((0, 0), (0, pad)), constant_values=0))
+        if combo_items:
+            self.combo_items = np.concatenate(combo_items)
+            self.combo_servings = np.concatenate(combo_servings)
+        else:
+            self.combo_items = np.zeros((0, max_items), dtype=np.int32)
+            self.combo_servings = np.zeros((0, max_items), dtype=np.int16)
+        padded_macros = np.vstack([self.menu.macros, np.zeros((1, len(MACRO_FIELDS)))])
+        # Summed one slot at a time so no combinations x max_items x macros array is ever materialized
+        totals = np.zeros((len(self.combo_items), len(MACRO_FIELDS)))
+        for slot in range(max_items):
+            totals += padded_macros[self.combo_items[:, slot]] * self.combo_servings[:, slot, None]
+        # Sorted by calories so users with similar targets only scan a contiguous calorie window;
+        # macro-major float32 layout keeps each scoring pass a single contiguous sweep
+        order = np.argsort(totals[:, 0], kind='stable')
+        self.combo_items = self.combo_items[order]
+        self.combo_servings = self.combo_servings[order]
+        self.combo_totals = np.ascontiguousarray(totals[order].T, dtype=np.float32)
+        self._valid_cache = {}
+
+    def __len__(self) -> int:
+        return self.combo_items.shape[0]
+
+    def valid_combinations(self, dietary_restrictions: List[str]) -> np.ndarray:
+        key = tuple(sorted({r.strip().lower() for r in dietary_restrictions or [] if r.strip()}))
+        if key not in self._valid_cache:
+            allowed = np.append(self.menu.allowed_mask(list(key)), True)  # padding slot is always allowed
+            self._valid_cache[key] = allowed[self.combo_items].all(axis=1)
+        return self._valid_cache[key]
+
+    def _score(self, targets: np.ndarray, scale: np.ndarray, window: slice) -> np.ndarray:
+        loss = np.empty((len(targets), window.stop - window.start), dtype=np.float32)
+        scratch = np.empty_like(loss)
+        for j in range(len(MACRO_FIELDS)):
+            out = loss if j == 0 else scratch
+            np.subtract(self.combo_totals[j, window][None, :], targets[:, j][:, None], out=out)
+            np.abs(out, out=out)
+            out *= scale[:, j][:, None]
+            if j:
+                loss += scratch
+        return loss
+
+    def plan(self, preferences_list: List[Dict], top_k: int = 3, chunk_size: int = 64, calorie_window: float = 0.35) -> List[List[Dict]]:
+        results = [[] for _ in preferences_list]
+        if len(self) == 0 or not preferences_list:
+            return results
+        targets = np.stack([get_macro_targets(p) for p in preferences_list]).astype(np.float32)
+        scale = (MACRO_WEIGHTS / np.maximum(targets, 1.0)).astype(np.float32)
+        top_k = min(top_k, len(self))
+        # Any combination outside the chunk's calorie window misses every user's calories by more than
+        # calorie_window, so its loss is at least this bound; a window result under it is exact
+        exact_bound = MACRO_WEIGHTS[0] * calorie_window
+        by_calories = np.argsort(targets[:, 0], kind='stable')
+        for start in range(0, len(by_calories), chunk_size):
+            users = by_calories[start:start + chunk_size]
+            low = targets[users, 0].min() * (1 - calorie_window)
+            high = targets[users, 0].max() * (1 + calorie_window)
+            window = slice(
+                int(np.searchsorted(self.combo_totals[0], low, side='left')),
+                int(np.searchsorted(self.combo_totals[0], high, side='right'))
+            )
+            loss = self._score(targets[users], scale[users], window)
+            for row, user in enumerate(users):
+                restrictions = preferences_list[user].get('dietary_restrictions', [])
+                valid = self.valid_combinations(restrictions)[window]
+                user_loss = loss[row]
+                if not valid.all():
+                    user_loss[~valid] = np.inf
+                offset = window.start
+                if user_loss.size < top_k or np.partition(user_loss, top_k - 1)[top_k - 1] > exact_bound:
+                    # Window can't prove the top-K; score this user against every combination
+                    user_loss = self._score(targets[user:user + 1], scale[user:user + 1], slice(0, len(self)))[0]
+                    user_loss[~self.valid_combinations(restrictions)] = np.inf
+                    offset = 0
+                best = np.argpartition(user_loss, top_k - 1)[:top_k]
+                best = best[np.argsort(user_loss[best], kind='stable')]
+                results[user] = [self._combo_plan(offset + c, user_loss[c]) for c in best if np.isfinite(user_loss[c])]
+        return results
+
+    def _combo_plan(self, combo: int, loss: float) -> Dict:
+        servings = [
+            (int(i), int(n)) for i, n in zip(self.combo_items[combo], self.combo_servings[combo]) if i >= 0
+        ]
+        servings.sort(key=lambda pair: -self.menu.macros[pair[0], 0] * pair[1])
+        return build_plan(self.menu, servings, self.combo_totals[:, combo], loss)
+
+
+def plan_batch(court_data: Dict, preferences_list: List[Dict], top_k: int = 3, max_items: int = 3) -> List[List[Dict]]:
+    return BatchPlanner(court_data, max_items=max_items).plan(preferences_list, top_k=top_k)
+
+
+def format_meal_plans(plans: List[Dict], descriptions: Optional[List[Dict]] = None,
+                      dietary_restrictions: Optional[List[str]] = None) -> str:
+    # Same layout the Gemini prompt asks for, so downstream output looks identical
+    disclaimer = "\n\n" + RESTRICTION_DISCLAIMER if any(r.strip() for r in dietary_restrictions or []) else ""
+    if not plans:
+        return "No meal plans could be built from this court's menu with the given restrictions." + disclaimer
+    sections = []
+    for i, plan in enumerate(plans, 1):
+        info = (descriptions or [])[i - 1] if descriptions and i <= len(descriptions) else {}
+        lines = [f"**MEAL PLAN {i}: {info.get('name') or plan['name']}**"]
+        if info.get('description'):
+            lines.append(info['description'])
+        for item in plan['items']:
+            lines.append(f"- {item['servings']} x {item['name']} ({item['serving_size']}) - {item['station']}")
+        totals = plan['totals']
+        lines.append(
+            f"Totals: {totals['total_calories']:.0f}cal, {totals['protein_g']:.0f}g protein, "
+            f"{totals['total_carbs_g']:.0f}g carbs, {totals['total_fat_g']:.0f}g fat"
+        )
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections) + disclaimer
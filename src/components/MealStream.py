@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from Settings import sibling_path
+
+STREAM_SUFFIX = '.jsonl'
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def get_stream_path(json_file_path: str) -> str:
+    return sibling_path(json_file_path, STREAM_SUFFIX)
+
+
+def get_manifest_path(stream_path: str) -> str:
+    return sibling_path(stream_path, MANIFEST_SUFFIX)
+
+
+class MealStreamWriter:
+    # One JSONL record per court, appended and flushed the moment that court's scrape finishes,
+    # so a slow court never holds up the others and a crash keeps every court already written
+    def __init__(self, stream_path: str, meal_time: str, date: str):
+        self.stream_path = stream_path
+        self.manifest_path = get_manifest_path(stream_path)
+        self.meal_time = meal_time
+        self.date = date
+        self.courts = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(stream_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(stream_path, 'w', encoding='utf-8')
+        self._write_manifest(complete=False)
+
+    def write_court(self, court_name: str, court_data: Dict) -> None:
+        line = json.dumps({'court': court_name, 'data': court_data}, ensure_ascii=False) + '\n'
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.courts.append({
+                'court': court_name,
+                'offset': offset,
+                'total_items': court_data.get('total_items', 0),
+                'written_at': round(time.time() - self.started_at, 3)
+            })
+            self._write_manifest(complete=False)
+
+    def finish(self) -> str:
+        with self._lock:
+            self._file.close()
+            self._write_manifest(complete=True)
+        return self.manifest_path
+
+    def _write_manifest(self, complete: bool) -> None:
+        # Written to a temp file and renamed so readers never see a half-written manifest
+        manifest = {
+            'stream': os.path.basename(self.stream_path),
+            'meal_time': self.meal_time,
+            'date': self.date,
+            'complete': complete,
+            'courts': self.courts,
+            'total_items': sum(court['total_items'] for court in self.courts)
+        }
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+
+def load_manifest(stream_path: str) -> Optional[Dict]:
+    manifest_path = get_manifest_path(stream_path)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_meal_stream(stream_path: str) -> Iterator[Tuple[str, Dict]]:
+    # Yields courts in the order they finished; a torn last line from an interrupted scrape is skipped
+    with open(stream_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                break
+            record = json.loads(line)
+            yield record['court'], record['data']
+
+
+def iter_dining_data(json_file_path: str) -> Iterator[Tuple[str, Dict]]:
+    # Prefer the streamed JSONL (explicitly, or a completed sibling) so only one court is in memory at a time.
+    # A sibling older than the .json is from an earlier run (e.g. a later scrape without SCRAPE_STREAM) and is ignored;
+    # its manifest is finished after the .json is written, so the newer of the two files dates the stream
+    if json_file_path.endswith(STREAM_SUFFIX):
+        yield from iter_meal_stream(json_file_path)
+        return
+    stream_path = get_stream_path(json_file_path)
+    manifest = load_manifest(stream_path) if os.path.exists(stream_path) else None
+    stream_current = manifest is not None and (
+        not os.path.exists(json_file_path)
+        or max(os.path.getmtime(stream_path), os.path.getmtime(get_manifest_path(stream_path))) >= os.path.getmtime(json_file_path)
+    )
+    if manifest and manifest.get('complete') and stream_current:
+        yield from iter_meal_stream(stream_path)
+        return
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        dining_data = json.load(f)
+    yield from dining_data.items()
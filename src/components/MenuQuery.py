@@ -0,0 +1,266 @@
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from NutrientStore import NUTRIENT_FIELDS, STRING_COLUMNS, NutrientStore, get_store_path
+
+OUTPUT_FILE_PATTERN = re.compile(r'^purdue_(.+)_(\d{4}-\d{2}-\d{2})\.json$')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+TEXT_COLUMNS = ['name', 'station']
+# Above this many candidates, top-K walks the sort index instead of gathering and partitioning every candidate
+TOP_K_WALK_MIN = 2048
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class MenuIndex:
+    # Every item row from every indexed output file, plus:
+    #   sorted_rows[field]  row ids ordered by that nutrient (NaN rows left out), with sorted_values alongside
+    #   postings[token]     ascending row ids whose name or station contains the token
+    # refresh() appends rows from new files and merges them into both indexes without re-sorting history
+    def __init__(self, fields: List[str] = None):
+        self.fields = fields or NUTRIENT_FIELDS
+        self._field_index = {field: i for i, field in enumerate(self.fields)}
+        self.nutrients = np.empty((0, len(self.fields)), dtype=np.float32)
+        self.codes = np.empty((0, len(STRING_COLUMNS)), dtype=np.int32)
+        self.alive = np.empty(0, dtype=bool)
+        self.item_ids: List[str] = []
+        self.tables: Dict[str, List[str]] = {column: [] for column in STRING_COLUMNS}
+        self._lookups: Dict[str, Dict[str, int]] = {column: {} for column in STRING_COLUMNS}
+        self.sorted_rows = {field: np.empty(0, dtype=np.int64) for field in self.fields}
+        self.sorted_values = {field: np.empty(0, dtype=np.float32) for field in self.fields}
+        self.postings: Dict[str, List[int]] = {}
+        self._posting_arrays: Dict[str, np.ndarray] = {}
+        self._code_tokens: Dict[Tuple[str, int], List[str]] = {}
+        # path -> (mtime, first row, end row) so changed files can be re-indexed
+        self.files: Dict[str, Tuple[float, int, int]] = {}
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def refresh(self, directory: str = '.') -> int:
+        # Index output files that are new or changed since the last refresh; returns how many were (re)indexed
+        indexed = 0
+        for name in sorted(os.listdir(directory)):
+            if not OUTPUT_FILE_PATTERN.match(name):
+                continue
+            path = os.path.join(directory, name)
+            mtime = os.path.getmtime(path)
+            previous = self.files.get(path)
+            if previous is not None and previous[0] == mtime:
+                continue
+            if previous is not None:
+                # Rewritten file: retire its old rows, then append the new ones
+                self.alive[previous[1]:previous[2]] = False
+            self.add_store(self._load_store(path), path, mtime)
+            indexed += 1
+        return indexed
+
+    @staticmethod
+    def _load_store(path: str) -> NutrientStore:
+        # A NutrientStore exported alongside the JSON is reused when it is at least as new
+        store_path = get_store_path(path)
+        if os.path.isdir(store_path) and os.path.getmtime(store_path) >= os.path.getmtime(path):
+            return NutrientStore.load(store_path, mmap=False)
+        with open(path, 'r', encoding='utf-8') as f:
+            return NutrientStore.from_dining_data(json.load(f))
+
+    def _encode(self, column: str, value: str) -> int:
+        lookup = self._lookups[column]
+        if value not in lookup:
+            lookup[value] = len(self.tables[column])
+            self.tables[column].append(value)
+        return lookup[value]
+
+    def add_store(self, store: NutrientStore, path: str = '', mtime: float = 0.0) -> None:
+        start = len(self.alive)
+        count = len(store)
+        # Re-map the file's own string codes onto the index-wide tables
+        codes = np.empty((count, len(STRING_COLUMNS)), dtype=np.int32)
+        for i, column in enumerate(STRING_COLUMNS):
+            remap = np.array([self._encode(column, value) for value in store.tables[column]], dtype=np.int32)
+            codes[:, i] = remap[store.codes[:, i]]
+        nutrients = np.full((count, len(self.fields)), np.nan, dtype=np.float32)
+        for field in self.fields:
+            if field in store.fields:
+                nutrients[:, self._field_index[field]] = store.column(field)
+
+        self.nutrients = np.concatenate([self.nutrients, nutrients])
+        self.codes = np.concatenate([self.codes, codes])
+        self.alive = np.concatenate([self.alive, np.ones(count, dtype=bool)])
+        self.item_ids.extend(store.item_ids)
+        if path:
+            self.files[path] = (mtime, start, start + count)
+
+        rows = np.arange(start, start + count)
+        for field in self.fields:
+            values = nutrients[:, self._field_index[field]]
+            present = ~np.isnan(values)
+            new_rows = rows[present]
+            new_values = values[present]
+            order = np.argsort(new_values, kind='stable')
+            new_rows, new_values = new_rows[order], new_values[order]
+            # Merge the sorted batch into the existing sorted index in one O(n) pass
+            positions = np.searchsorted(self.sorted_values[field], new_values, side='right')
+            self.sorted_rows[field] = np.insert(self.sorted_rows[field], positions, new_rows)
+            self.sorted_values[field] = np.insert(self.sorted_values[field], positions, new_values)
+
+        # Token lists are computed once per distinct name/station string, not per row
+        text_codes = [codes[:, STRING_COLUMNS.index(column)] for column in TEXT_COLUMNS]
+        for offset in range(count):
+            row = start + offset
+            tokens = set()
+            for column, column_codes in zip(TEXT_COLUMNS, text_codes):
+                key = (column, int(column_codes[offset]))
+                if key not in self._code_tokens:
+                    self._code_tokens[key] = tokenize(self.tables[column][key[1]])
+                tokens.update(self._code_tokens[key])
+            for token in tokens:
+                self.postings.setdefault(token, []).append(row)
+                self._posting_arrays.pop(token, None)
+
+    def _posting(self, token: str) -> np.ndarray:
+        posting = self._posting_arrays.get(token)
+        if posting is None:
+            posting = np.array(self.postings.get(token, ()), dtype=np.int64)
+            self._posting_arrays[token] = posting
+        return posting
+
+    def _range_rows(self, field: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        values = self.sorted_values[field]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return self.sorted_rows[field][start:end]
+
+    def _code_mask(self, column: str, accept) -> np.ndarray:
+        # Per-code booleans for a string column, so filters cost one gather instead of a string compare per row
+        return np.fromiter((bool(accept(value)) for value in self.tables[column]), dtype=bool, count=len(self.tables[column]))
+
+    def _mask(self, rows: np.ndarray, ranges: Dict, skip_field: Optional[str], postings: List[np.ndarray], code_filters: List[Tuple[int, np.ndarray]]) -> np.ndarray:
+        mask = self.alive[rows]
+        for field, (low, high) in ranges.items():
+            if field == skip_field:
+                continue
+            values = self.nutrients[rows, self._field_index[field]]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for posting in postings:
+            mask &= np.isin(rows, posting, assume_unique=True)
+        for column_index, accepted in code_filters:
+            mask &= accepted[self.codes[rows, column_index]]
+        return mask
+
+    def query(self, ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None, text: Optional[str] = None,
+              court: Optional[str] = None, station: Optional[str] = None, meal_time: Optional[str] = None,
+              date_from: Optional[str] = None, date_to: Optional[str] = None,
+              top_k: Optional[int] = None, sort_by: Optional[str] = None, descending: bool = True) -> np.ndarray:
+        # Row ids matching every filter; with sort_by they are ordered by that nutrient, limited to top_k
+        ranges = {field: bounds for field, bounds in (ranges or {}).items() if bounds != (None, None)}
+        postings = [self._posting(token) for token in tokenize(text or '')]
+        code_filters = []
+        for column, value in (('court', court), ('station', station), ('meal_time', meal_time)):
+            if value is not None:
+                code_filters.append((STRING_COLUMNS.index(column), self._code_mask(column, lambda v: v == value)))
+        if date_from is not None or date_to is not None:
+            # Dates are YYYY/MM/DD strings, so lexicographic order is chronological order
+            low, high = (date_from or '').replace('-', '/'), (date_to or '9999').replace('-', '/')
+            code_filters.append((STRING_COLUMNS.index('date'), self._code_mask('date', lambda date: low <= date <= high)))
+
+        # Start from the narrowest index slice: a nutrient range is a contiguous run of its sorted index,
+        # a text token is its posting list
+        candidates, seed_field, seed_posting = None, None, None
+        for field, (low, high) in ranges.items():
+            rows = self._range_rows(field, low, high)
+            if candidates is None or len(rows) < len(candidates):
+                candidates, seed_field = rows, field
+        for i, posting in enumerate(postings):
+            if candidates is None or len(posting) < len(candidates):
+                candidates, seed_field, seed_posting = posting, None, i
+
+        if sort_by is not None and top_k is not None and seed_field != sort_by and (candidates is None or len(candidates) > TOP_K_WALK_MIN):
+            # Broad filters: walk sort_by's index from the best end and stop once top_k rows pass
+            return self._walk_top_k(sort_by, top_k, descending, ranges, postings, code_filters)
+
+        if candidates is None:
+            candidates = self.sorted_rows[sort_by] if sort_by is not None else np.arange(len(self.alive))
+            seed_field = sort_by
+        # The seed slice already satisfies its own range or token
+        remaining = [posting for i, posting in enumerate(postings) if i != seed_posting]
+        rows = candidates[self._mask(candidates, ranges, seed_field, remaining, code_filters)]
+
+        if sort_by is None:
+            return rows[:top_k] if top_k is not None else rows
+        if seed_field == sort_by:
+            # Candidates came from sort_by's own index and are already in order
+            ordered = rows[::-1] if descending else rows
+            return ordered[:top_k] if top_k is not None else ordered
+        values = self.nutrients[rows, self._field_index[sort_by]]
+        keep = ~np.isnan(values)
+        rows, values = rows[keep], values[keep]
+        keys = -values if descending else values
+        if top_k is not None and top_k < len(rows):
+            partition = np.argpartition(keys, top_k)[:top_k]
+            rows, keys = rows[partition], keys[partition]
+        return rows[np.argsort(keys, kind='stable')]
+
+    def _walk_top_k(self, sort_by: str, top_k: int, descending: bool, ranges: Dict, postings: List[np.ndarray], code_filters: List) -> np.ndarray:
+        order = self.sorted_rows[sort_by]
+        if descending:
+            order = order[::-1]
+        found = []
+        position, chunk = 0, max(64, 4 * top_k)
+        while position < len(order) and sum(len(rows) for rows in found) < top_k:
+            rows = order[position:position + chunk]
+            found.append(rows[self._mask(rows, ranges, None, postings, code_filters)])
+            position += chunk
+            chunk *= 2
+        return np.concatenate(found)[:top_k] if found else np.empty(0, dtype=np.int64)
+
+    def item(self, row: int) -> Dict:
+        item = {column: self.tables[column][self.codes[row, i]] for i, column in enumerate(STRING_COLUMNS)}
+        item['item_id'] = self.item_ids[row]
+        for field, value in zip(self.fields, self.nutrients[row]):
+            if not np.isnan(value):
+                item[field] = float(value)
+        return item
+
+    def items(self, rows: np.ndarray) -> List[Dict]:
+        return [self.item(int(row)) for row in rows]
+
+
+def open_menu_index(directory: str = None) -> MenuIndex:
+    index = MenuIndex()
+    index.refresh(directory or os.environ.get('SCRAPE_OUTPUT_DIR') or '.')
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python MenuQuery.py [text ...]
+    # QUERY_MIN_<field> / QUERY_MAX_<field> (e.g. QUERY_MIN_protein_g=30 QUERY_MAX_total_calories=500) set ranges;
+    # QUERY_COURT, QUERY_MEAL_TIME, QUERY_DATE_FROM / QUERY_DATE_TO, QUERY_SORT_BY and QUERY_TOP_K narrow the result
+    index = open_menu_index()
+    ranges = {}
+    for field in index.fields:
+        low = os.environ.get(f'QUERY_MIN_{field}')
+        high = os.environ.get(f'QUERY_MAX_{field}')
+        if low or high:
+            ranges[field] = (float(low) if low else None, float(high) if high else None)
+    rows = index.query(
+        ranges=ranges,
+        text=' '.join(sys.argv[1:]) or None,
+        court=os.environ.get('QUERY_COURT'),
+        meal_time=os.environ.get('QUERY_MEAL_TIME'),
+        date_from=os.environ.get('QUERY_DATE_FROM'),
+        date_to=os.environ.get('QUERY_DATE_TO'),
+        sort_by=os.environ.get('QUERY_SORT_BY'),
+        top_k=int(os.environ.get('QUERY_TOP_K', '20'))
+    )
+    print(json.dumps(index.items(rows), indent=2))
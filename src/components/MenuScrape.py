@@ -1,24 +1,100 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup, SoupStrainer
+import requests
+from requests.adapters import HTTPAdapter
+import threading
 import time
 import json
+import re
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from urllib.parse import urlsplit
 import os
+from NutritionCache import open_nutrition_cache
+from DriverPool import DriverPool
+from PerfMetrics import PROFILE_SUFFIX, get_perf_path, metrics, profiled, write_perf_report
+from Settings import env_flag, sibling_path
+import atexit
+
+
+# Base URLs are overridable so the scraper can run against a local stand-in server
+DINING_SITE_URL = os.environ.get('DINING_SITE_URL', 'https://dining.purdue.edu').rstrip('/')
+DINING_API_URL = os.environ.get('DINING_API_URL', 'https://api.hfs.purdue.edu/menus/v2').rstrip('/')
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+SCRAPE_ENGINES = ['selenium', 'http']
+MENU_PAGE_TIMEOUT = float(os.environ.get('SCRAPE_MENU_TIMEOUT', '15'))
+NUTRITION_PAGE_TIMEOUT = float(os.environ.get('SCRAPE_ITEM_TIMEOUT', '10'))
+NUTRITION_EMPTY_RETRIES = int(os.environ.get('SCRAPE_EMPTY_RETRIES', '2'))
+# Seconds a loaded menu page may show no station items before the court counts as closed for that meal
+# (the original scraper parsed whatever had rendered after a fixed 4 s sleep)
+MENU_EMPTY_SETTLE = float(os.environ.get('SCRAPE_MENU_EMPTY_SETTLE', '4'))
+# Seconds a loaded nutrition page may show no table rows before it counts as an item with nothing published
+# (the original scraper parsed whatever had rendered after a fixed 1.5 s sleep)
+NUTRITION_EMPTY_SETTLE = float(os.environ.get('SCRAPE_ITEM_EMPTY_SETTLE', '3'))
+# Retry budgets: extra fetches per item and extra passes per court after a request or parse error. An item with no
+# published nutrition or a court with no menu is a result, not a failure, and is never retried
+ITEM_RETRIES = int(os.environ.get('SCRAPE_ITEM_RETRIES', '1'))
+COURT_RETRIES = int(os.environ.get('SCRAPE_COURT_RETRIES', '1'))
+RETRY_BACKOFF = float(os.environ.get('SCRAPE_RETRY_BACKOFF', '0.5'))
+VALID_MEAL_TIMES = ['breakfast', 'lunch', 'dinner', 'brunch', 'late lunch']
+
+
+class HostRateLimiter:
+    # Spaces requests to the same host at least 1/rate seconds apart, across all threads
+    def __init__(self, rate_per_second=0.0):
+        self.set_rate(rate_per_second)
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second and rate_per_second > 0 else 0.0
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+rate_limiter = HostRateLimiter(float(os.environ.get('SCRAPE_RATE_LIMIT', '0')))
 
 
 def setup_headless_driver():
+    # Selenium is imported on first use so the HTTP engine and importers of this module start fast
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
     chrome_options = Options()
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--log-level=3")
-    chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-    driver = webdriver.Chrome(options=chrome_options)
+    chrome_options.add_argument(f"--user-agent={USER_AGENT}")
+    with metrics.stage('driver_startup'):
+        driver = webdriver.Chrome(options=chrome_options)
     return driver
 
 
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    # Warm browsers are shared by every court and meal time scraped in this process
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            size = int(os.environ.get('SCRAPE_DRIVER_POOL_SIZE', '4'))
+            max_uses = int(os.environ.get('SCRAPE_DRIVER_MAX_USES', '200'))
+            _driver_pool = DriverPool(setup_headless_driver, size=size, max_uses=max_uses)
+            atexit.register(_driver_pool.close)
+        return _driver_pool
+
+
 def get_todays_date():
     return datetime.now().strftime("%Y/%m/%d")
 
@@ -30,6 +106,104 @@ def get_meal_time_url(meal_time):
         return meal_time.capitalize()
 
 
+def get_dining_courts(meal_time):
+    if meal_time == "late lunch":
+        return ['Hillenbrand', 'Windsor']
+    return ['Earhart', 'Ford', 'Hillenbrand', 'Wiley', 'Windsor']
+
+
+def get_output_path(meal_time, date=None, out_dir=None):
+    date_for_filename = (date if date else get_todays_date()).replace('/', '-')
+    filename = f'purdue_{meal_time.replace(" ", "_")}_{date_for_filename}.json'
+    if out_dir:
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+        except Exception:
+            pass
+        return os.path.join(out_dir, filename)
+    return filename
+
+
+def write_meal_output(data, meal_time, date=None, out_dir=None):
+    filepath = get_output_path(meal_time, date, out_dir)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    return filepath
+
+
+def find_previous_output(meal_time, date=None, out_dir=None):
+    # Latest purdue_<meal>_<date>.json on or before the given date
+    date_key = (date if date else get_todays_date()).replace('/', '-')
+    pattern = re.compile(rf'^purdue_{re.escape(meal_time.replace(" ", "_"))}_(\d{{4}}-\d{{2}}-\d{{2}})\.json$')
+    candidates = []
+    for filename in os.listdir(out_dir or '.'):
+        match = pattern.match(filename)
+        if match and match.group(1) <= date_key:
+            candidates.append((match.group(1), filename))
+    if not candidates:
+        return None
+    filename = max(candidates)[1]
+    return os.path.join(out_dir, filename) if out_dir else filename
+
+
+ITEM_BASE_KEYS = ('name', 'station', 'court', 'meal_time', 'nutrition_url')
+
+
+def index_court_items(court_data):
+    items = {}
+    for station_items in (court_data or {}).get('stations', {}).values():
+        for item in station_items:
+            if item.get('nutrition_url'):
+                items[get_item_id(item['nutrition_url'])] = item
+    return items
+
+
+def get_carried_nutrition(previous_items, nutrition_url, food_name):
+    # Unchanged items (same UUID and name, with nutrition) are carried forward instead of re-fetched
+    if not previous_items:
+        return None
+    previous = previous_items.get(get_item_id(nutrition_url))
+    if not previous or previous.get('name') != food_name or 'total_calories' not in previous:
+        return None
+    return {k: v for k, v in previous.items() if k not in ITEM_BASE_KEYS}
+
+
+def build_change_log(previous_data, all_data):
+    def summarize(item_id, item):
+        return {'item_id': item_id, 'name': item.get('name'), 'station': item.get('station')}
+
+    change_log = {}
+    for court_name, court_data in all_data.items():
+        previous_items = index_court_items((previous_data or {}).get(court_name))
+        current_items = index_court_items(court_data)
+        added = []
+        changed = []
+        for item_id, item in current_items.items():
+            if item_id not in previous_items:
+                added.append(summarize(item_id, item))
+            elif previous_items[item_id].get('name') != item.get('name'):
+                changed.append(summarize(item_id, item))
+        removed = [summarize(item_id, item) for item_id, item in previous_items.items() if item_id not in current_items]
+        change_log[court_name] = {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+            'unchanged': len(current_items) - len(added) - len(changed)
+        }
+    return change_log
+
+
+def get_scrape_engine():
+    engine = os.environ.get('SCRAPE_ENGINE', 'selenium').lower().strip()
+    return engine if engine in SCRAPE_ENGINES else 'selenium'
+
+
+def get_item_id(nutrition_url):
+    # Nutrition URLs look like /menus/item/<uuid> or /menus/item/<uuid>/<uuid>
+    path = nutrition_url.split('/menus/item/', 1)[-1]
+    return path.strip('/').split('/')[0]
+
+
 label_map = {
     'total fat': 'total_fat_g',
     'saturated fat': 'saturated_fat_g',
@@ -58,67 +232,424 @@ label_map = {
 }
 
 
-def scrape_nutrition_data(driver, nutrition_url):
-    try:
-        driver.get(nutrition_url)
-        time.sleep(1.5)  # Reduced sleep to speed up
-        strainer = SoupStrainer('div', class_='nutrition-table-row')
-        soup = BeautifulSoup(driver.page_source, 'lxml', parse_only=strainer)
-        nutrition_data = {}
-        # Parse serving size and calories from full page once (outside strainer)
-        full_soup = BeautifulSoup(driver.page_source, 'lxml')
-        serving_size_elem = full_soup.find('span', class_='nutrition-feature-servingSize-quantity')
-        if serving_size_elem:
-            nutrition_data['serving_size'] = serving_size_elem.get_text().strip()
-        calories_elem = full_soup.find('span', class_='nutrition-feature-calories-quantity')
-        if calories_elem:
+NON_NUMERIC_PATTERN = re.compile(r'[^\d.]')
+
+
+def parse_nutrition_value(value_text):
+    value_text = value_text.strip()
+    if '<' in value_text:
+        return 0.5
+    if '%' in value_text or not value_text:
+        return None
+    numeric_part = NON_NUMERIC_PATTERN.sub('', value_text.split(None, 1)[0])
+    if not numeric_part:
+        return None
+    return float(numeric_part)
+
+
+@lru_cache(maxsize=512)
+def match_nutrition_label(label):
+    # Labels come from a small fixed vocabulary, so the substring scan runs once per distinct label
+    if 'added sugar' in label:
+        return 'added_sugar_g'
+    return next((label_map[k] for k in label_map if k in label), None)
+
+
+_nutrition_cache = None
+_nutrition_cache_opened = False
+_nutrition_cache_lock = threading.Lock()
+
+
+def get_nutrition_cache():
+    global _nutrition_cache, _nutrition_cache_opened
+    with _nutrition_cache_lock:
+        if not _nutrition_cache_opened:
+            _nutrition_cache = open_nutrition_cache(os.environ.get('SCRAPE_OUTPUT_DIR'))
+            _nutrition_cache_opened = True
+        return _nutrition_cache
+
+
+def get_cached_nutrition(nutrition_url, fetch, refresh=False):
+    cache = get_nutrition_cache()
+    if cache is None:
+        return fetch()
+    return cache.get_or_fetch(get_item_id(nutrition_url), fetch, refresh=refresh)
+
+
+def resolve_item_nutrition(court_name, nutrition_url, food_name, previous_items, checkpoint, fetch):
+    # Previous snapshot, then checkpoint, then the cache/network with this item's own retry budget
+    nutrition_data = get_carried_nutrition(previous_items, nutrition_url, food_name)
+    if nutrition_data is not None:
+        metrics.count('nutrition_carried')
+        return nutrition_data
+    if checkpoint is not None:
+        nutrition_data = checkpoint.get_item(court_name, nutrition_url)
+        if nutrition_data is not None:
+            metrics.count('nutrition_checkpointed')
+            return nutrition_data
+    nutrition_data = None
+    with metrics.stage('item_fetch'):
+        for attempt in range(ITEM_RETRIES + 1):
             try:
-                nutrition_data['total_calories'] = int(calories_elem.get_text().strip())
-            except ValueError:
-                nutrition_data['total_calories'] = 0
-        for row in soup:
-            label_elem = row.find('span', class_='table-row-label')
-            value_elem = row.find('span', class_='table-row-labelValue')
+                # Retries go past the cache to the site
+                nutrition_data = get_cached_nutrition(nutrition_url, fetch, refresh=attempt > 0)
+                break
+            except Exception as e:
+                print(f"[{court_name}] {food_name}: nutrition fetch failed ({e})")
+            if attempt < ITEM_RETRIES:
+                metrics.count('item_retries')
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+    if nutrition_data is None:
+        metrics.count('item_failures')
+        if checkpoint is not None:
+            checkpoint.mark_failed(court_name, nutrition_url)
+        return {}
+    # No calories means the site publishes none for this item (e.g. a salad bar); that is still a finished item
+    if 'total_calories' not in nutrition_data:
+        metrics.count('nutrition_empty')
+    if 'allergens' in nutrition_data or 'ingredients' in nutrition_data:
+        metrics.count('allergen_items')
+    if checkpoint is not None:
+        checkpoint.put_item(court_name, nutrition_url, nutrition_data)
+    return nutrition_data
+
+
+class dom_settled:
+    # Ready once the selector matches and its count is unchanged between two polls,
+    # which is when the dining SPA has finished rendering what its API calls returned.
+    # With empty_after, a loaded page that still has no matches after that many seconds is settled as 'empty'
+    # (an item with no published nutrition, a closed court). Only the selectors the scraper already parses are
+    # used; no recorded page from the live site shows a dedicated "no data" marker to wait on instead
+    def __init__(self, css_selector, empty_after=None):
+        self.css_selector = css_selector
+        self.empty_after = empty_after
+        self.last_count = -1
+        self.empty_since = None
+
+    def __call__(self, driver):
+        if driver.execute_script("return document.readyState") != 'complete':
+            return False
+        from selenium.webdriver.common.by import By
+        count = len(driver.find_elements(By.CSS_SELECTOR, self.css_selector))
+        settled = count > 0 and count == self.last_count
+        self.last_count = count
+        if settled:
+            return 'ready'
+        if count or self.empty_after is None:
+            self.empty_since = None
+            return False
+        now = time.monotonic()
+        if self.empty_since is None:
+            self.empty_since = now
+        return 'empty' if now - self.empty_since >= self.empty_after else False
+
+
+def wait_for_page_ready(driver, css_selector, timeout, empty_after=None):
+    # 'ready', 'empty' (loaded, but nothing matched css_selector for empty_after seconds) or None on timeout
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.support.ui import WebDriverWait
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.15).until(dom_settled(css_selector, empty_after))
+    except TimeoutException:
+        return None
+
+
+NUTRITION_STRAINER = SoupStrainer(class_=[
+    'nutrition-table-row',
+    'nutrition-feature-servingSize-quantity',
+    'nutrition-feature-calories-quantity',
+    'nutrition-ingredients-text',
+    'nutrition-allergen'
+])
+MENU_STRAINER = SoupStrainer('div', class_='station')
+
+
+def parse_nutrition_html(page_source):
+    # One strained parse yields the serving size, calories, table rows, ingredients and allergens as top-level elements
+    soup = BeautifulSoup(page_source, 'lxml', parse_only=NUTRITION_STRAINER)
+    serving_size = None
+    calories = None
+    ingredients = None
+    allergens = []
+    nutrients = {}
+    for elem in soup.find_all(True, recursive=False):
+        classes = elem.get('class') or ()
+        if 'nutrition-table-row' in classes:
+            label_elem = elem.find('span', class_='table-row-label')
+            value_elem = elem.find('span', class_='table-row-labelValue')
             if label_elem and value_elem:
-                label = label_elem.get_text().strip().lower()
-                value_text = value_elem.get_text().strip()
                 try:
-                    if '<' in value_text:
-                        value = 0.5
-                    elif '%' in value_text:
+                    value = parse_nutrition_value(value_elem.get_text())
+                    if value is None:
                         continue
-                    else:
-                        numeric_part = ''.join(filter(lambda x: x.isdigit() or x == '.', value_text.split()[0]))
-                        if numeric_part:
-                            value = float(numeric_part)
-                        else:
-                            continue
-                    if 'added sugar' in label:
-                        nutrition_data['added_sugar_g'] = value
-                    else:
-                        matched_key = next((label_map[k] for k in label_map if k in label), None)
-                        if matched_key:
-                            nutrition_data[matched_key] = value
+                    matched_key = match_nutrition_label(label_elem.get_text().strip().lower())
+                    if matched_key:
+                        nutrients[matched_key] = value
                 except Exception:
                     continue
+        elif serving_size is None and 'nutrition-feature-servingSize-quantity' in classes:
+            serving_size = elem.get_text().strip()
+        elif calories is None and 'nutrition-feature-calories-quantity' in classes:
+            try:
+                calories = int(elem.get_text().strip())
+            except ValueError:
+                calories = 0
+        elif 'nutrition-allergen' in classes:
+            allergens.append(elem.get_text().strip())
+        elif ingredients is None and 'nutrition-ingredients-text' in classes:
+            ingredients = elem.get_text().strip()
+
+    nutrition_data = {}
+    if serving_size is not None:
+        nutrition_data['serving_size'] = serving_size
+    if calories is not None:
+        nutrition_data['total_calories'] = calories
+    nutrition_data.update(nutrients)
+    # Kept for the meal planners' dietary restriction filters. UNVERIFIED: these two classes come from the
+    # synthesized fixture and mock site, not from a recorded live page, so on the real SPA they may never match;
+    # the allergen_items counter in the .perf.json shows whether any item had them
+    if ingredients:
+        nutrition_data['ingredients'] = ingredients
+    if allergens:
+        nutrition_data['allergens'] = allergens
+    return nutrition_data
+
+
+def parse_menu_html(page_source):
+    # Returns [(station_name, [(food_name, href), ...]), ...] in page order
+    soup = BeautifulSoup(page_source, 'lxml', parse_only=MENU_STRAINER)
+    listing = []
+    for station in soup.find_all('div', class_='station'):
+        station_name_elem = station.find('div', class_='station-name')
+        if not station_name_elem:
+            continue
+        items = []
+        for container in station.find_all('div', class_='station-item--container_plain'):
+            name_span = container.find('span', class_='station-item-text')
+            link = container.find('a', class_='station-item')
+            if name_span and link and link.get('href'):
+                items.append((name_span.get_text().strip(), link.get('href')))
+        listing.append((station_name_elem.get_text().strip(), items))
+    return listing
+
+
+def scrape_nutrition_data(driver, nutrition_url):
+    # Raises when the page could not be loaded or never rendered; returns {} or partial facts for an item
+    # that rendered without them
+    try:
+        metrics.count('nutrition_fetches')
+        with metrics.stage('nutrition_page_load'):
+            rate_limiter.wait(nutrition_url)
+            driver.get(nutrition_url)
+        nutrition_data = {}
+        for attempt in range(NUTRITION_EMPTY_RETRIES + 1):
+            with metrics.stage('nutrition_page_wait'):
+                page_state = wait_for_page_ready(driver, 'div.nutrition-table-row', NUTRITION_PAGE_TIMEOUT, NUTRITION_EMPTY_SETTLE)
+            with metrics.stage('nutrition_parse'):
+                nutrition_data = parse_nutrition_html(driver.page_source)
+            if 'total_calories' in nutrition_data:
+                break
+            # The page loaded but no table appeared within NUTRITION_EMPTY_SETTLE: nothing is published for the item,
+            # so a refresh would not help
+            if page_state == 'empty':
+                metrics.count('nutrition_no_table')
+                break
+            # An empty table otherwise usually means the page rendered before its data arrived
+            if attempt < NUTRITION_EMPTY_RETRIES:
+                metrics.count('nutrition_retries')
+                rate_limiter.wait(nutrition_url)
+                driver.refresh()
+        if page_state is None and 'total_calories' not in nutrition_data:
+            raise TimeoutError(f"Nutrition page not ready after {NUTRITION_PAGE_TIMEOUT:.0f}s")
         return nutrition_data
     except Exception:
-        return {}
+        metrics.count('nutrition_errors')
+        raise
+
+
+_http_session = None
+_http_session_pool_size = 0
+_http_session_lock = threading.Lock()
+
+
+def get_http_session(concurrent_courts=2):
+    # One keep-alive session shared by every court and worker thread. Its pool holds a connection for each
+    # nutrition worker of every court in flight (SCRAPE_HTTP_POOL_SIZE overrides); a caller running more
+    # courts at once grows it, so no worker's connection is dropped as "pool is full"
+    global _http_session, _http_session_pool_size
+    pool_size = int(os.environ.get('SCRAPE_HTTP_POOL_SIZE') or 0) or concurrent_courts * int(os.environ.get('SCRAPE_HTTP_WORKERS', '8'))
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT, 'Accept': 'application/json'})
+            _http_session = session
+        if pool_size > _http_session_pool_size:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=2)
+            _http_session.mount('http://', adapter)
+            _http_session.mount('https://', adapter)
+            _http_session_pool_size = pool_size
+        return _http_session
+
+
+def http_get_json(url, timeout=15):
+    rate_limiter.wait(url)
+    response = get_http_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_nutrition_http(nutrition_url):
+    # Raises on a request or decode error; an item the API lists without facts returns {}
+    try:
+        metrics.count('nutrition_fetches')
+        with metrics.stage('nutrition_fetch_http'):
+            item = http_get_json(f"{DINING_API_URL}/items/{get_item_id(nutrition_url)}")
+        nutrition_data = {}
+        facts = item.get('Nutrition') or []
+        for fact in facts:
+            label = str(fact.get('Name', '')).strip().lower()
+            if label == 'serving size':
+                if fact.get('LabelValue'):
+                    nutrition_data['serving_size'] = str(fact['LabelValue']).strip()
+            elif label == 'calories':
+                try:
+                    nutrition_data['total_calories'] = int(round(float(fact.get('Value') or 0)))
+                except (TypeError, ValueError):
+                    nutrition_data['total_calories'] = 0
+        for fact in facts:
+            label = str(fact.get('Name', '')).strip().lower()
+            matched_key = match_nutrition_label(label)
+            if not matched_key:
+                continue
+            try:
+                if fact.get('Value') is not None:
+                    value = float(fact['Value'])
+                else:
+                    value = parse_nutrition_value(str(fact.get('LabelValue', '')))
+            except (TypeError, ValueError):
+                continue
+            if value is not None:
+                nutrition_data[matched_key] = value
+        # Ingredients/Allergens are not read by the original v2 client (server/scripts/apiScraper.js) either, so
+        # their presence and shape on the live API are unverified; items without them fall back to name matching
+        if item.get('Ingredients'):
+            nutrition_data['ingredients'] = str(item['Ingredients']).strip()
+        # Allergens come as [{'Name': 'Milk', 'Value': true}, ...] with Value true when the item contains it
+        allergens = [str(a.get('Name', '')).strip() for a in item.get('Allergens') or [] if isinstance(a, dict) and a.get('Value')]
+        if allergens:
+            nutrition_data['allergens'] = allergens
+        return nutrition_data
+    except Exception:
+        metrics.count('nutrition_errors')
+        raise
+
+
+def scrape_single_court_meal_time_http(court_name="Earhart", meal_time="lunch", date=None, previous_items=None, checkpoint=None):
+    if date is None:
+        date = get_todays_date()
+    print(f"[{court_name} - {meal_time.capitalize()}] Starting HTTP scrape for {date}...")
+    with metrics.stage('menu_fetch_http'):
+        menu = http_get_json(f"{DINING_API_URL}/locations/{court_name}/{date.replace('/', '-')}")
+    meal_name = get_meal_time_url(meal_time).replace('%20', ' ').lower()
+    meal = next((m for m in menu.get('Meals') or [] if str(m.get('Name', '')).lower() == meal_name), None)
+    stations = (meal or {}).get('Stations') or []
+    print(f"[{court_name} - {meal_time.capitalize()}] Found {len(stations)} stations")
+
+    court_data = {
+        'dining_court': court_name,
+        'meal_time': meal_time,
+        'date': date,
+        'stations': {},
+        'total_items': 0
+    }
+
+    def fetch_item_nutrition(menu_item, station_name):
+        item_id = menu_item.get('ID')
+        food_name = str(menu_item.get('Name', '')).strip()
+        if not item_id or not food_name:
+            return None
+        nutrition_url = f"{DINING_SITE_URL}/menus/item/{item_id}"
+        nutrition_data = resolve_item_nutrition(
+            court_name, nutrition_url, food_name, previous_items, checkpoint, lambda: fetch_nutrition_http(nutrition_url)
+        )
+        return {
+            'name': food_name,
+            'station': station_name,
+            'court': court_name,
+            'meal_time': meal_time,
+            'nutrition_url': nutrition_url,
+            **nutrition_data
+        }
 
+    max_workers = int(os.environ.get('SCRAPE_HTTP_WORKERS', '8'))
+    with ThreadPoolExecutor(max_workers=max_workers) as nutrition_executor:
+        for station in stations:
+            station_name = str(station.get('Name', '')).strip()
+            if not station_name:
+                continue
+            futures = [nutrition_executor.submit(fetch_item_nutrition, menu_item, station_name) for menu_item in station.get('Items') or []]
+            station_items = []
+            for future in as_completed(futures):
+                item = future.result()
+                if item:
+                    station_items.append(item)
 
-def scrape_single_court_meal_time(court_name="Earhart", meal_time="lunch", date=None):
+            court_data['stations'][station_name] = station_items
+            court_data['total_items'] += len(station_items)
+            print(f"[{court_name} - {meal_time.capitalize()}] {station_name}: {len(station_items)} items")
+
+    print(f"[{court_name} - {meal_time.capitalize()}] Complete! {court_data['total_items']} items across {len(court_data['stations'])} stations")
+    return court_name, court_data
+
+
+def scrape_single_court_meal_time(court_name="Earhart", meal_time="lunch", date=None, engine=None, driver_pool=None, previous_items=None, checkpoint=None):
     if date is None:
         date = get_todays_date()
+    if checkpoint is not None and checkpoint.get_court(court_name) is not None:
+        metrics.count('courts_checkpointed')
+        print(f"[{court_name} - {meal_time.capitalize()}] Restored from checkpoint")
+        return court_name, checkpoint.get_court(court_name)
+    with metrics.stage('court_scrape'):
+        court_name, court_data = _scrape_single_court_meal_time(court_name, meal_time, date, engine, driver_pool, previous_items, checkpoint)
+    if checkpoint is not None and not court_needs_retry(court_data) and checkpoint.failed_items(court_name) == 0:
+        checkpoint.put_court(court_name, court_data)
+    return court_name, court_data
+
+
+def court_needs_retry(court_data):
+    # Only an exception fails the whole court; a closed court (no stations) is complete, and items that failed
+    # already used their own budget
+    return 'error' in court_data
+
+
+def _scrape_single_court_meal_time(court_name, meal_time, date, engine, driver_pool, previous_items, checkpoint):
+    if (engine or get_scrape_engine()) == 'http':
+        try:
+            return scrape_single_court_meal_time_http(court_name, meal_time, date, previous_items, checkpoint)
+        except Exception as e:
+            # Selenium stays as the fallback when the JSON endpoints are unavailable
+            metrics.count('http_fallbacks')
+            print(f"[{court_name} - {meal_time.capitalize()}] HTTP engine failed ({e}), falling back to Selenium")
+    if driver_pool is None:
+        driver_pool = get_driver_pool()
     print(f"[{court_name} - {meal_time.capitalize()}] Starting scrape for {date}...")
-    driver = setup_headless_driver()
     try:
         meal_time_url = get_meal_time_url(meal_time)
-        url = f"https://dining.purdue.edu/menus/{court_name}/{date}/{meal_time_url}/"
-        driver.get(url)
-        time.sleep(4)  # Reduced wait time
-        strainer = SoupStrainer('div', class_='station')
-        soup = BeautifulSoup(driver.page_source, 'lxml', parse_only=strainer)
-        stations = soup.find_all('div', class_='station')
+        url = f"{DINING_SITE_URL}/menus/{court_name}/{date}/{meal_time_url}/"
+        with driver_pool.lease() as driver, metrics.stage('menu_page_load'):
+            rate_limiter.wait(url)
+            driver.get(url)
+            # A loaded page that shows no station items is a court closed for this meal, recorded empty as before;
+            # only a page that never finishes loading is an error
+            page_state = wait_for_page_ready(driver, 'div.station-item--container_plain', MENU_PAGE_TIMEOUT, MENU_EMPTY_SETTLE)
+            if page_state is None:
+                metrics.count('menu_not_ready')
+                raise TimeoutError(f"Menu page not ready after {MENU_PAGE_TIMEOUT:.0f}s")
+            if page_state == 'empty':
+                metrics.count('menus_closed')
+            page_source = driver.page_source
+        with metrics.stage('menu_parse'):
+            stations = parse_menu_html(page_source)
         print(f"[{court_name} - {meal_time.capitalize()}] Found {len(stations)} stations")
 
         court_data = {
@@ -129,36 +660,37 @@ def scrape_single_court_meal_time(court_name="Earhart", meal_time="lunch", date=
             'total_items': 0
         }
 
-        # Parallelize nutrition scraping inside each station
-        def fetch_item_nutrition(container, station_name):
-            name_span = container.find('span', class_='station-item-text')
-            if name_span:
-                food_name = name_span.get_text().strip()
-                link = container.find('a', class_='station-item')
-                if link and link.get('href'):
-                    nutrition_url = "https://dining.purdue.edu" + link.get('href')
-                    nutrition_data = scrape_nutrition_data(driver, nutrition_url)
-                    food_item = {
-                        'name': food_name,
-                        'station': station_name,
-                        'court': court_name,
-                        'meal_time': meal_time,
-                        'nutrition_url': nutrition_url,
-                        **nutrition_data
-                    }
-                    return food_item
-            return None
+        def scrape_with_pooled_driver(nutrition_url):
+            # Each worker leases its own driver; a driver that stops responding is recycled
+            driver = driver_pool.acquire()
+            discard = False
+            try:
+                return scrape_nutrition_data(driver, nutrition_url)
+            except Exception:
+                discard = not driver_pool.is_alive(driver)
+                raise
+            finally:
+                driver_pool.release(driver, discard=discard)
 
-        for station in stations:
-            station_name_elem = station.find('div', class_='station-name')
-            if not station_name_elem:
-                continue
-            station_name = station_name_elem.get_text().strip()
-            food_containers = station.find_all('div', class_='station-item--container_plain')
+        # Parallelize nutrition scraping inside each station
+        def fetch_item_nutrition(food_name, href, station_name):
+            nutrition_url = DINING_SITE_URL + href
+            nutrition_data = resolve_item_nutrition(
+                court_name, nutrition_url, food_name, previous_items, checkpoint, lambda: scrape_with_pooled_driver(nutrition_url)
+            )
+            return {
+                'name': food_name,
+                'station': station_name,
+                'court': court_name,
+                'meal_time': meal_time,
+                'nutrition_url': nutrition_url,
+                **nutrition_data
+            }
 
+        for station_name, menu_items in stations:
             station_items = []
-            with ThreadPoolExecutor(max_workers=5) as nutrition_executor:
-                futures = [nutrition_executor.submit(fetch_item_nutrition, container, station_name) for container in food_containers]
+            with ThreadPoolExecutor(max_workers=driver_pool.size) as nutrition_executor:
+                futures = [nutrition_executor.submit(fetch_item_nutrition, food_name, href, station_name) for food_name, href in menu_items]
                 for future in as_completed(futures):
                     item = future.result()
                     if item:
@@ -172,34 +704,56 @@ def scrape_single_court_meal_time(court_name="Earhart", meal_time="lunch", date=
         return court_name, court_data
     except Exception as e:
         print(f"[{court_name} - {meal_time.capitalize()}] Error: {e}")
-        return court_name, {'dining_court': court_name, 'meal_time': meal_time, 'date': date, 'stations': {}, 'total_items': 0}
-    finally:
-        driver.quit()
+        return court_name, {'dining_court': court_name, 'meal_time': meal_time, 'date': date, 'stations': {}, 'total_items': 0, 'error': str(e)}
 
 
-def scrape_all_courts_meal_time(meal_time="lunch", date=None):
+def scrape_all_courts_meal_time(meal_time="lunch", date=None, engine=None, previous_data=None, on_court_complete=None, checkpoint=None):
     if date is None:
         date = get_todays_date()
-    if meal_time == "late lunch":
-        dining_courts = ['Hillenbrand', 'Windsor']
-    else:
-        dining_courts = ['Earhart', 'Ford', 'Hillenbrand', 'Wiley', 'Windsor']
+    if engine is None:
+        engine = get_scrape_engine()
+    dining_courts = get_dining_courts(meal_time)
     all_data = {}
-    print(f"Starting concurrent scraping of all dining courts for {meal_time.capitalize()} on {date}...")
-    with ThreadPoolExecutor(max_workers=len(dining_courts)) as executor:
-        future_to_court = {
-            executor.submit(scrape_single_court_meal_time, court, meal_time, date): court
-            for court in dining_courts
-        }
-        for future in as_completed(future_to_court):
-            court_name, court_data = future.result()
-            all_data[court_name] = court_data
-            completed = len(all_data)
-            total = len(dining_courts)
-            print(f"\n*** {court_name} {meal_time.capitalize()} FINISHED! ({completed}/{total} courts complete) ***")
-            stations = court_data.get('stations', {})
-            total_items = court_data.get('total_items', 0)
-            print(f"    {len(stations)} stations, {total_items} total items")
+    total = len(dining_courts)
+    print(f"Starting concurrent scraping of all dining courts for {meal_time.capitalize()} on {date} ({engine} engine)...")
+    pending_courts = dining_courts
+    if engine == 'http':
+        get_http_session(len(dining_courts))
+    for attempt in range(COURT_RETRIES + 1):
+        retry_courts = []
+        with ThreadPoolExecutor(max_workers=len(pending_courts)) as executor:
+            future_to_court = {
+                executor.submit(
+                    scrape_single_court_meal_time, court, meal_time, date, engine,
+                    previous_items=index_court_items((previous_data or {}).get(court)), checkpoint=checkpoint
+                ): court
+                for court in pending_courts
+            }
+            for future in as_completed(future_to_court):
+                court_name, court_data = future.result()
+                # Only the failed courts go around again; completed items come back from the checkpoint
+                if court_needs_retry(court_data) and attempt < COURT_RETRIES:
+                    metrics.count('court_retries')
+                    print(f"\n*** {court_name} {meal_time.capitalize()} failed, retrying ({attempt + 1}/{COURT_RETRIES}) ***")
+                    retry_courts.append(court_name)
+                    continue
+                all_data[court_name] = court_data
+                # Hand each court downstream as soon as it lands (e.g. MealStreamWriter.write_court)
+                if on_court_complete is not None:
+                    on_court_complete(court_name, court_data)
+                completed = len(all_data)
+                print(f"\n*** {court_name} {meal_time.capitalize()} FINISHED! ({completed}/{total} courts complete) ***")
+                stations = court_data.get('stations', {})
+                total_items = court_data.get('total_items', 0)
+                print(f"    {len(stations)} stations, {total_items} total items")
+        if not retry_courts:
+            break
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        pending_courts = retry_courts
+    cache = get_nutrition_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Nutrition cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
     return all_data
 
 
@@ -246,35 +800,95 @@ if __name__ == "__main__":
     # Non-interactive mode via env vars
     env_meal_time = os.environ.get('SCRAPE_MEAL_TIME')
     env_date = os.environ.get('SCRAPE_DATE')  # YYYY/MM/DD or empty for today
+    # SCRAPE_ENGINE=http fetches the dining JSON endpoints directly; selenium (default) drives Chrome
+    # SCRAPE_MENU_TIMEOUT / SCRAPE_ITEM_TIMEOUT (seconds) and SCRAPE_EMPTY_RETRIES tune page readiness waits;
+    # SCRAPE_ITEM_EMPTY_SETTLE / SCRAPE_MENU_EMPTY_SETTLE are how long a loaded page may show no table / no stations
+    # before the item counts as empty / the court as closed
+    # SCRAPE_DRIVER_POOL_SIZE bounds concurrent Chrome instances; SCRAPE_DRIVER_MAX_USES recycles them
+    # SCRAPE_CACHE=off|<path>, SCRAPE_CACHE_REFRESH=1 and SCRAPE_CACHE_TTL_HOURS control the nutrition cache
+    # SCRAPE_RATE_LIMIT caps requests per second per host (0 = unlimited)
+    # SCRAPE_INCREMENTAL=1 reuses unchanged items from the previous output and writes a .changes.json log
+    # SCRAPE_COLUMNAR=1 also writes a memory-mappable NutrientStore next to the JSON output
+    # SCRAPE_STREAM=1 appends each court to a .jsonl file as it finishes, plus a .manifest.json
+    # SCRAPE_CHECKPOINT=off disables the .checkpoint.jsonl that lets a rerun resume after failures
+    # SCRAPE_ITEM_RETRIES / SCRAPE_COURT_RETRIES set the per-item and per-court retry budgets (SCRAPE_RETRY_BACKOFF seconds)
+    # Every run writes per-stage timings and counters to a .perf.json; SCRAPE_PROFILE=1 adds a cProfile .prof dump
+    # Date-range backfills run through ScrapeBackfill.py
     out_dir = os.environ.get('SCRAPE_OUTPUT_DIR')  # optional
 
     if env_meal_time:
         meal_time = env_meal_time.lower().strip()
-        valid_meal_times = ['breakfast', 'lunch', 'dinner', 'brunch', 'late lunch']
-        if meal_time not in valid_meal_times:
+        if meal_time not in VALID_MEAL_TIMES:
             meal_time = 'lunch'
         date = env_date if env_date else None
-        data = scrape_all_courts_meal_time(meal_time, date)
-        date_for_filename = (date if date else get_todays_date()).replace('/', '-')
-        filename = f'purdue_{meal_time.replace(" ", "_")}_{date_for_filename}.json'
-        if out_dir:
-            try:
-                os.makedirs(out_dir, exist_ok=True)
-            except Exception:
-                pass
-            filepath = os.path.join(out_dir, filename)
-        else:
-            filepath = filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        incremental = env_flag('SCRAPE_INCREMENTAL')
+        previous_data = None
+        if incremental:
+            previous_path = find_previous_output(meal_time, date, out_dir)
+            if previous_path:
+                print(f"Incremental mode: diffing against {previous_path}")
+                with open(previous_path, 'r', encoding='utf-8') as f:
+                    previous_data = json.load(f)
+        stream_writer = None
+        if env_flag('SCRAPE_STREAM'):
+            from MealStream import MealStreamWriter, get_stream_path
+            stream_writer = MealStreamWriter(
+                get_stream_path(get_output_path(meal_time, date, out_dir)), meal_time, date or get_todays_date()
+            )
+        checkpoint = None
+        if env_flag('SCRAPE_CHECKPOINT', default=True):
+            from ScrapeCheckpoint import ScrapeCheckpoint, get_checkpoint_path
+            checkpoint = ScrapeCheckpoint(get_checkpoint_path(get_output_path(meal_time, date, out_dir)))
+            if checkpoint.resumed:
+                print(f"Resuming from {checkpoint.path} ({len(checkpoint.courts)} courts, {len(checkpoint.items)} items done)")
+        profile_path = None
+        if env_flag('SCRAPE_PROFILE'):
+            profile_path = get_perf_path(get_output_path(meal_time, date, out_dir), PROFILE_SUFFIX)
+        with profiled(profile_path):
+            data = scrape_all_courts_meal_time(
+                meal_time, date, previous_data=previous_data,
+                on_court_complete=stream_writer.write_court if stream_writer else None, checkpoint=checkpoint
+            )
+        filepath = write_meal_output(data, meal_time, date, out_dir)
+        result = {"ok": True, "file": filepath, "meal_time": meal_time}
+        if checkpoint is not None:
+            # Kept only while something is left to retry, so the next run picks up just those units
+            failed_courts = [name for name, court in data.items() if court_needs_retry(court)]
+            failed_items = sum(checkpoint.failed_items(name) for name in data)
+            checkpoint.close(remove=not failed_courts and not failed_items)
+            if failed_courts or failed_items:
+                result["checkpoint"] = {"path": checkpoint.path, "failed_courts": failed_courts, "failed_items": failed_items}
+        cache = get_nutrition_cache()
+        scraped_items = sum(court.get('total_items', 0) for court in data.values())
+        result["perf"] = write_perf_report(filepath, {
+            'nutrition_empty_rate': round(metrics.counters.get('nutrition_empty', 0) / scraped_items, 4) if scraped_items else 0.0,
+            'item_failures': metrics.counters.get('item_failures', 0),
+            'meal_time': meal_time,
+            'date': date or get_todays_date(),
+            'engine': get_scrape_engine(),
+            'courts': {name: court.get('total_items', 0) for name, court in data.items()},
+            'nutrition_cache': cache.stats() if cache is not None else None
+        })
+        if profile_path:
+            result["profile"] = profile_path
+        if stream_writer:
+            result["stream"] = stream_writer.stream_path
+            result["manifest"] = stream_writer.finish()
+        if incremental:
+            changes_path = sibling_path(filepath, '.changes.json')
+            with open(changes_path, 'w', encoding='utf-8') as f:
+                json.dump(build_change_log(previous_data, data), f, indent=2)
+            result["changes"] = changes_path
+        if env_flag('SCRAPE_COLUMNAR'):
+            from NutrientStore import export_nutrient_store
+            result["store"] = export_nutrient_store(filepath)
         # Print minimal notice to stdout so caller can pick up file path
-        print(json.dumps({"ok": True, "file": filepath, "meal_time": meal_time}))
+        print(json.dumps(result))
     else:
         # Interactive fallback
         print("🍽️ Purdue Dining Scraper with Meal Times")
         meal_time = input("Enter meal time (breakfast/lunch/dinner/brunch/late lunch): ").lower().strip()
-        valid_meal_times = ['breakfast', 'lunch', 'dinner', 'brunch', 'late lunch']
-        if meal_time not in valid_meal_times:
+        if meal_time not in VALID_MEAL_TIMES:
             print("Invalid meal time. Using 'lunch' as default.")
             meal_time = 'lunch'
         use_today = input("Use today's date? (y/n): ").lower().strip()
@@ -285,10 +899,7 @@ if __name__ == "__main__":
             date = input("Enter date (YYYY/MM/DD): ").strip()
         print(f"Scraping {meal_time.capitalize()} menus...")
         data = scrape_all_courts_meal_time(meal_time, date)
-        date_for_filename = date if date else get_todays_date().replace('/', '-')
-        filename = f'purdue_{meal_time.replace(" ", "_")}_{date_for_filename}.json'
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        filename = write_meal_output(data, meal_time, date, out_dir)
         print(f"\nData saved to {filename}")
         print_detailed_summary(data, meal_time)
         print(f"\n✅ Complete! Your team now has comprehensive {meal_time.capitalize()} dining data with full nutrition info.")
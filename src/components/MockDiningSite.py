@@ -0,0 +1,227 @@
+import json
+import os
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+from MenuScrape import get_item_id, label_map
+
+# Recorded output JSON is replayed both as the v2 API (SCRAPE_ENGINE=http) and as the dining SPA's rendered HTML
+# (Selenium engine), so either backend can be benchmarked without touching dining.purdue.edu
+LABEL_UNITS = {'_mcg': 'mcg', '_mg': 'mg', '_g': 'g'}
+PAGE_HEAD = (
+    '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n<title>Purdue Dining</title>\n</head>\n'
+    '<body>\n<div id="root">\n<main class="main">\n'
+)
+PAGE_TAIL = '</main>\n</div>\n</body>\n</html>\n'
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    # The default accept backlog of 5 overflows with 16+ concurrent fetchers, and the dropped SYNs retry after ~1 s,
+    # which would make the benchmark measure the mock instead of the scraper
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def get_label_unit(key: str) -> str:
+    return next((unit for suffix, unit in LABEL_UNITS.items() if key.endswith(suffix)), '')
+
+
+class RecordedMenus:
+    # Courts indexed by (court, YYYY-MM-DD) -> {meal name: stations}, and item nutrition by item id
+    def __init__(self, recording_paths: List[str]):
+        self.menus: Dict[tuple, Dict[str, Dict]] = {}
+        self.items: Dict[str, Dict] = {}
+        for path in recording_paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                dining_data = json.load(f)
+            for court_name, court_data in dining_data.items():
+                date = court_data.get('date', '').replace('/', '-')
+                meal_name = court_data.get('meal_time', '').title()
+                self.menus.setdefault((court_name, date), {})[meal_name] = court_data.get('stations', {})
+                for items in court_data.get('stations', {}).values():
+                    for item in items:
+                        if item.get('nutrition_url'):
+                            self.items[get_item_id(item['nutrition_url'])] = item
+
+    def location_json(self, court_name: str, date: str) -> Dict:
+        meals = self.menus.get((court_name, date), {})
+        return {'Meals': [
+            {'Name': meal_name, 'Stations': [
+                {'Name': station_name, 'Items': [
+                    {'ID': get_item_id(item['nutrition_url']), 'Name': item['name']}
+                    for item in items if item.get('nutrition_url')
+                ]}
+                for station_name, items in stations.items()
+            ]}
+            for meal_name, stations in meals.items()
+        ]}
+
+    def item_json(self, item_id: str, empty: bool = False) -> Optional[Dict]:
+        item = self.items.get(item_id)
+        if item is None:
+            return None
+        facts = []
+        if not empty:
+            if 'serving_size' in item:
+                facts.append({'Name': 'Serving Size', 'LabelValue': item['serving_size']})
+            if 'total_calories' in item:
+                facts.append({'Name': 'Calories', 'Value': item['total_calories']})
+            for label, key in list(label_map.items()) + [('added sugar', 'added_sugar_g')]:
+                if key in item:
+                    facts.append({'Name': label.capitalize(), 'Value': item[key], 'LabelValue': f"{item[key]}{get_label_unit(key)}"})
+        body = {'ID': item_id, 'Name': item['name'], 'Nutrition': facts}
+        if not empty and item.get('ingredients'):
+            body['Ingredients'] = item['ingredients']
+        if not empty and item.get('allergens'):
+            body['Allergens'] = [{'Name': allergen, 'Value': True} for allergen in item['allergens']]
+        return body
+
+    def menu_html(self, court_name: str, date: str, meal_name: str) -> str:
+        stations = self.menus.get((court_name, date), {}).get(meal_name.title(), {})
+        parts = [PAGE_HEAD, f'<div class="menu"><h1 class="menu-title">{escape(court_name)} &mdash; {escape(meal_name)}</h1>\n']
+        for station_name, items in stations.items():
+            parts.append(f'<div class="station">\n<div class="station-name">{escape(station_name)}</div>\n<div class="station-items">\n')
+            for item in items:
+                href = '/menus/item/' + get_item_id(item.get('nutrition_url', ''))
+                parts.append(
+                    f'<div class="station-item--container_plain"><a class="station-item" href="{href}">'
+                    f'<span class="station-item-text">{escape(item["name"])}</span></a></div>\n'
+                )
+            parts.append('</div>\n</div>\n')
+        parts.append('</div>\n' + PAGE_TAIL)
+        return ''.join(parts)
+
+    def item_html(self, item_id: str, empty: bool = False) -> Optional[str]:
+        item = self.items.get(item_id)
+        if item is None:
+            return None
+        parts = [PAGE_HEAD, f'<div class="nutrition">\n<h1 class="nutrition-title">{escape(item["name"])}</h1>\n']
+        if not empty:
+            parts.append('<div class="nutrition-feature">\n')
+            if 'serving_size' in item:
+                parts.append(f'<div class="nutrition-feature-servingSize"><span class="nutrition-feature-servingSize-quantity">{escape(item["serving_size"])}</span></div>\n')
+            if 'total_calories' in item:
+                parts.append(f'<div class="nutrition-feature-calories"><span class="nutrition-feature-calories-quantity">{item["total_calories"]}</span></div>\n')
+            parts.append('</div>\n<div class="nutrition-table">\n')
+            for label, key in list(label_map.items()) + [('added sugar', 'added_sugar_g')]:
+                if key in item:
+                    parts.append(
+                        f'<div class="nutrition-table-row"><span class="table-row-label">{label.capitalize()}</span>'
+                        f'<span class="table-row-labelValue">{item[key]}{get_label_unit(key)}</span></div>\n'
+                    )
+            parts.append('</div>\n')
+            if item.get('ingredients'):
+                parts.append(f'<div class="nutrition-ingredients"><p class="nutrition-ingredients-text">{escape(item["ingredients"])}</p></div>\n')
+            if item.get('allergens'):
+                parts.append('<div class="nutrition-allergens">' + ''.join(
+                    f'<span class="nutrition-allergen">{escape(allergen)}</span>' for allergen in item['allergens']
+                ) + '</div>\n')
+        parts.append('</div>\n' + PAGE_TAIL)
+        return ''.join(parts)
+
+
+class MockDiningSite:
+    def __init__(self, recording_paths: List[str], latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, empty_rate: float = 0.0, seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.recorded = RecordedMenus(recording_paths)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = MockHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self):
+        # One seeded draw per request: (delay seconds, fail?, serve an empty nutrition page?)
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.error_rate
+            empty = self._random.random() < self.empty_rate
+            if fail:
+                self.errors += 1
+        return delay, fail, empty
+
+    def respond(self, path: str):
+        # Returns (status, content type, body) for a request path
+        delay, fail, empty = self._draw()
+        time.sleep(delay)
+        if fail:
+            return 503, 'text/plain', 'Injected failure'
+        parts = [unquote(part) for part in urlsplit(path).path.strip('/').split('/')]
+        if parts[0] == 'api' and len(parts) == 4 and parts[1] == 'locations':
+            return 200, 'application/json', json.dumps(self.recorded.location_json(parts[2], parts[3]))
+        if parts[0] == 'api' and len(parts) == 3 and parts[1] == 'items':
+            body = self.recorded.item_json(parts[2], empty)
+            return (200, 'application/json', json.dumps(body)) if body else (404, 'text/plain', 'Unknown item')
+        if parts[0] == 'menus' and len(parts) >= 3 and parts[1] == 'item':
+            body = self.recorded.item_html(parts[2], empty)
+            return (200, 'text/html', body) if body else (404, 'text/plain', 'Unknown item')
+        if parts[0] == 'menus' and len(parts) == 6:
+            # /menus/<court>/<YYYY>/<MM>/<DD>/<Meal>/
+            return 200, 'text/html', self.recorded.menu_html(parts[1], '-'.join(parts[2:5]), parts[5])
+        return 404, 'text/plain', 'Not found'
+
+    def _make_handler(self):
+        site = self
+
+        class MockHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                status, content_type, body = site.respond(self.path)
+                payload = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return MockHandler
+
+    def start(self) -> 'MockDiningSite':
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python MockDiningSite.py <purdue_<meal>_<date>.json> [...]
+    # MOCK_PORT (0 = any free port), MOCK_LATENCY_MS / MOCK_JITTER_MS, MOCK_ERROR_RATE (503s), MOCK_EMPTY_RATE
+    # (nutrition pages with no data) and MOCK_SEED configure the replay. Point the scraper at it with
+    # DINING_SITE_URL=<url> DINING_API_URL=<url>/api
+    site = MockDiningSite(
+        sys.argv[1:],
+        latency_ms=float(os.environ.get('MOCK_LATENCY_MS', '0')),
+        jitter_ms=float(os.environ.get('MOCK_JITTER_MS', '0')),
+        error_rate=float(os.environ.get('MOCK_ERROR_RATE', '0')),
+        empty_rate=float(os.environ.get('MOCK_EMPTY_RATE', '0')),
+        seed=int(os.environ.get('MOCK_SEED', '0')),
+        port=int(os.environ.get('MOCK_PORT', '0'))
+    )
+    # First stdout line is machine-readable so a harness can find the port
+    print(json.dumps({'url': site.url, 'api_url': site.url + '/api', 'items': len(site.recorded.items)}), flush=True)
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,139 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from MenuScrape import get_item_id, label_map
+from Settings import sibling_path
+
+NUTRIENT_FIELDS = ['total_calories'] + list(label_map.values()) + ['added_sugar_g']
+STRING_COLUMNS = ['name', 'station', 'court', 'meal_time', 'date']
+STORE_SUFFIX = '.nutrients'
+
+
+class NutrientStore:
+    # nutrients: float32 items x NUTRIENT_FIELDS, NaN where the scrape had no value
+    # codes: int32 items x STRING_COLUMNS, indexes into the matching string table
+    def __init__(self, nutrients: np.ndarray, codes: np.ndarray, tables: Dict[str, List[str]], fields: List[str], item_ids: List[str]):
+        self.nutrients = nutrients
+        self.codes = codes
+        self.tables = tables
+        self.fields = fields
+        self.item_ids = item_ids
+        self._field_index = {field: i for i, field in enumerate(fields)}
+
+    def __len__(self) -> int:
+        return self.nutrients.shape[0]
+
+    @classmethod
+    def from_dining_data(cls, dining_data: Dict, fields: List[str] = None) -> 'NutrientStore':
+        fields = fields or NUTRIENT_FIELDS
+        tables = {column: [] for column in STRING_COLUMNS}
+        lookups = {column: {} for column in STRING_COLUMNS}
+        rows = []
+        codes = []
+        item_ids = []
+
+        def encode(column, value):
+            lookup = lookups[column]
+            if value not in lookup:
+                lookup[value] = len(tables[column])
+                tables[column].append(value)
+            return lookup[value]
+
+        for court_name, court_data in dining_data.items():
+            meal_time = court_data.get('meal_time', '')
+            date = court_data.get('date', '')
+            for station_name, items in court_data.get('stations', {}).items():
+                for item in items:
+                    rows.append([item.get(field, np.nan) for field in fields])
+                    codes.append([
+                        encode('name', item.get('name', '')),
+                        encode('station', station_name),
+                        encode('court', court_name),
+                        encode('meal_time', meal_time),
+                        encode('date', date)
+                    ])
+                    item_ids.append(get_item_id(item['nutrition_url']) if item.get('nutrition_url') else '')
+
+        nutrients = np.array(rows, dtype=np.float32).reshape(len(rows), len(fields))
+        codes = np.array(codes, dtype=np.int32).reshape(len(codes), len(STRING_COLUMNS))
+        return cls(nutrients, codes, tables, fields, item_ids)
+
+    def write(self, store_path: str) -> str:
+        os.makedirs(store_path, exist_ok=True)
+        # Plain .npy files (not .npz) so the loader can memory-map them
+        np.save(os.path.join(store_path, 'nutrients.npy'), np.ascontiguousarray(self.nutrients, dtype=np.float32))
+        np.save(os.path.join(store_path, 'codes.npy'), np.ascontiguousarray(self.codes, dtype=np.int32))
+        with open(os.path.join(store_path, 'tables.json'), 'w', encoding='utf-8') as f:
+            json.dump({'fields': self.fields, 'tables': self.tables, 'item_ids': self.item_ids}, f)
+        return store_path
+
+    @classmethod
+    def load(cls, store_path: str, mmap: bool = True) -> 'NutrientStore':
+        mmap_mode = 'r' if mmap else None
+        nutrients = np.load(os.path.join(store_path, 'nutrients.npy'), mmap_mode=mmap_mode)
+        codes = np.load(os.path.join(store_path, 'codes.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(store_path, 'tables.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return cls(nutrients, codes, meta['tables'], meta['fields'], meta['item_ids'])
+
+    def column(self, field: str) -> np.ndarray:
+        return self.nutrients[:, self._field_index[field]]
+
+    def missing_mask(self) -> np.ndarray:
+        return np.isnan(self.nutrients)
+
+    def strings(self, column: str) -> np.ndarray:
+        table = np.array(self.tables[column], dtype=object)
+        return table[self.codes[:, STRING_COLUMNS.index(column)]]
+
+    def select(self, ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None, **equals: str) -> np.ndarray:
+        # Row indices matching every (min, max) nutrient range and exact court/station/meal_time/date/name value
+        mask = np.ones(len(self), dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            values = self.column(field)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for column, value in equals.items():
+            table = self.tables[column]
+            if value not in table:
+                return np.array([], dtype=np.int64)
+            mask &= self.codes[:, STRING_COLUMNS.index(column)] == table.index(value)
+        return np.nonzero(mask)[0]
+
+    def item(self, row: int) -> Dict:
+        item = {column: self.tables[column][self.codes[row, i]] for i, column in enumerate(STRING_COLUMNS)}
+        item['item_id'] = self.item_ids[row]
+        for field, value in zip(self.fields, self.nutrients[row]):
+            if not np.isnan(value):
+                item[field] = float(value)
+        return item
+
+
+def get_store_path(json_file_path: str) -> str:
+    return sibling_path(json_file_path, STORE_SUFFIX)
+
+
+def export_nutrient_store(json_file_path: str, store_path: str = None) -> str:
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        dining_data = json.load(f)
+    return NutrientStore.from_dining_data(dining_data).write(store_path or get_store_path(json_file_path))
+
+
+def iter_stores(directory: str) -> Iterator[Tuple[str, NutrientStore]]:
+    # Memory-maps each day's store in date order; only the rows a query touches are paged in
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(STORE_SUFFIX) and os.path.isdir(path):
+            yield path, NutrientStore.load(path)
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python NutrientStore.py <purdue_<meal>_<date>.json> [...]
+    for json_file in sys.argv[1:]:
+        print(f"Wrote {export_nutrient_store(json_file)}")
@@ -0,0 +1,43 @@
+import json
+import os
+from typing import Callable, Dict, Optional
+
+from Settings import FALSE_VALUES, env_flag
+from SqliteCache import SqliteCache
+
+
+class NutritionCache(SqliteCache):
+    # Nutrition facts as JSON by item id, expiring after a week by default
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 24 * 3600, max_items: int = 20000, refresh: bool = False):
+        super().__init__(db_path, ttl_seconds=ttl_seconds, max_items=max_items, refresh=refresh)
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        cached = super().get(item_id)
+        return json.loads(cached) if cached is not None else None
+
+    def put(self, item_id: str, nutrition_data: Dict) -> None:
+        super().put(item_id, json.dumps(nutrition_data))
+
+    def get_or_fetch(self, item_id: str, fetch: Callable[[], Dict], refresh: bool = False) -> Dict:
+        # refresh=True skips the lookup (a retry must not get the same answer back) and overwrites the entry
+        if not refresh:
+            cached = self.get(item_id)
+            if cached is not None:
+                return cached
+        nutrition_data = fetch()
+        # Only complete facts are cached; empty or partial ones (e.g. just a serving size) are fetched again next time
+        if 'total_calories' in nutrition_data:
+            self.put(item_id, nutrition_data)
+        return nutrition_data
+
+
+def open_nutrition_cache(out_dir: Optional[str] = None) -> Optional[NutritionCache]:
+    # SCRAPE_CACHE=off bypasses the cache entirely; any other value is the database path
+    setting = os.environ.get('SCRAPE_CACHE', '').strip()
+    if setting.lower() in FALSE_VALUES:
+        return None
+    db_path = setting or os.path.join(out_dir or '.', 'nutrition_cache.sqlite3')
+    ttl_hours = float(os.environ.get('SCRAPE_CACHE_TTL_HOURS', '168'))
+    max_items = int(os.environ.get('SCRAPE_CACHE_MAX_ITEMS', '20000'))
+    refresh = env_flag('SCRAPE_CACHE_REFRESH')
+    return NutritionCache(db_path, ttl_seconds=ttl_hours * 3600, max_items=max_items, refresh=refresh)
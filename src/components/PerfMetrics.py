@@ -0,0 +1,130 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+from Settings import sibling_path
+
+PERF_SUFFIX = '.perf.json'
+PROFILE_SUFFIX = '.prof'
+# Samples kept per stage for the percentiles, so a long-running process (DiningService) stays bounded;
+# count and total_s still cover every sample
+MAX_SAMPLES = int(os.environ.get('PERF_MAX_SAMPLES', '10000'))
+
+
+class PerfRecorder:
+    # Thread-safe stage timings and counters for one run; scrape workers all record into the same instance
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.perf_counter()
+            self.durations: Dict[str, Deque[float]] = {}
+            self.totals: Dict[str, List[float]] = {}
+            self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.max_samples or None)
+                self.totals[name] = [0, 0.0]
+            self.durations[name].append(seconds)
+            self.totals[name][0] += 1
+            self.totals[name][1] += seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self) -> Dict:
+        with self._lock:
+            stages = {}
+            for name, samples in sorted(self.durations.items()):
+                ordered = sorted(samples)
+                count, total = self.totals[name]
+                stages[name] = {
+                    'count': count,
+                    'total_s': round(total, 4),
+                    'mean_ms': round(1000 * total / count, 2),
+                    'p50_ms': round(1000 * ordered[len(ordered) // 2], 2),
+                    'p95_ms': round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                    'p99_ms': round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+                    'max_ms': round(1000 * ordered[-1], 2)
+                }
+            return {
+                'wall_s': round(time.perf_counter() - self.started_at, 4),
+                'stages': stages,
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+
+metrics = PerfRecorder()
+
+
+def get_perf_path(output_path: str, suffix: str = PERF_SUFFIX) -> str:
+    # purdue_lunch_2025-09-20.json -> purdue_lunch_2025-09-20.perf.json
+    return sibling_path(output_path, suffix)
+
+
+def write_perf_report(output_path: str, extra: Optional[Dict] = None) -> str:
+    report = metrics.report()
+    if extra:
+        report.update(extra)
+    perf_path = get_perf_path(output_path)
+    with open(perf_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return perf_path
+
+
+@contextmanager
+def profiled(profile_path: Optional[str], top: int = 25) -> Iterator[None]:
+    # cProfile for the whole block, including worker threads started inside it (each gets its own profiler,
+    # merged at the end). The .prof dump opens in pstats/snakeviz; a cumulative-time summary is printed
+    if not profile_path:
+        yield
+        return
+    thread_profilers = []
+
+    def start_thread_profiler(frame, event, arg):
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the main profiler and allows only one active
+            return
+        thread_profilers.append(profiler)
+
+    profiler = cProfile.Profile()
+    threading.setprofile(start_thread_profiler)
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiler)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        directory = os.path.dirname(profile_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(profile_path)
+        stats.sort_stats('cumulative').print_stats(top)
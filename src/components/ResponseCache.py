@@ -0,0 +1,28 @@
+import hashlib
+import json
+import os
+from typing import Any, Optional
+
+from Settings import FALSE_VALUES
+from SqliteCache import SqliteCache
+
+
+def make_cache_key(payload: Any) -> str:
+    # Canonical JSON so key order and whitespace never change the address
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache(SqliteCache):
+    # Gemini responses by prompt key, bounded by total stored text rather than entry count
+    def __init__(self, db_path: str, max_bytes: int = 50 * 1024 * 1024):
+        super().__init__(db_path, max_bytes=max_bytes, evict_every=1)
+
+
+def open_response_cache() -> Optional[ResponseCache]:
+    # GEMINI_CACHE=off disables caching; any other value is the database path
+    setting = os.environ.get('GEMINI_CACHE', '').strip()
+    if setting.lower() in FALSE_VALUES:
+        return None
+    max_mb = float(os.environ.get('GEMINI_CACHE_MAX_MB', '50'))
+    return ResponseCache(setting or 'gemini_cache.sqlite3', max_bytes=int(max_mb * 1024 * 1024))
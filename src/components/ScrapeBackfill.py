@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+import MenuScrape
+from MenuScrape import (
+    VALID_MEAL_TIMES,
+    court_needs_retry,
+    get_dining_courts,
+    get_output_path,
+    get_scrape_engine,
+    rate_limiter,
+    scrape_single_court_meal_time,
+    write_meal_output,
+)
+from NutrientStore import export_nutrient_store
+from ScrapeCheckpoint import ScrapeCheckpoint, get_checkpoint_path
+from Settings import env_flag
+
+
+def parse_date(value):
+    return datetime.strptime(value.strip().replace('-', '/'), "%Y/%m/%d")
+
+
+def get_date_range(start_date, end_date):
+    start = parse_date(start_date)
+    end = parse_date(end_date)
+    dates = []
+    while start <= end:
+        dates.append(start.strftime("%Y/%m/%d"))
+        start += timedelta(days=1)
+    return dates
+
+
+async def backfill_date_range(start_date, end_date, meal_times, concurrency=4, engine=None, out_dir=None, skip_existing=True, columnar=False, checkpoints=True):
+    if engine is None:
+        engine = get_scrape_engine()
+    loop = asyncio.get_running_loop()
+    # Scrapes are blocking (Selenium/requests), so units run on a thread pool sized to the concurrency cap
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    if engine == 'http':
+        MenuScrape.get_http_session(concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    groups = {}
+    group_checkpoints = {}
+    for date in get_date_range(start_date, end_date):
+        for meal_time in meal_times:
+            output_path = get_output_path(meal_time, date, out_dir)
+            # A leftover checkpoint means the existing file still has failed courts or items to retry
+            if skip_existing and os.path.exists(output_path) and not os.path.exists(get_checkpoint_path(output_path)):
+                print(f"Skipping {meal_time.capitalize()} on {date} (output exists)")
+                continue
+            groups[(meal_time, date)] = {court: None for court in get_dining_courts(meal_time)}
+            if checkpoints:
+                group_checkpoints[(meal_time, date)] = ScrapeCheckpoint(get_checkpoint_path(output_path))
+
+    async def run_unit(court, meal_time, date):
+        scrape = partial(
+            scrape_single_court_meal_time, court, meal_time, date, engine,
+            checkpoint=group_checkpoints.get((meal_time, date))
+        )
+        # Each unit has its own court retry budget; the slot is released while it backs off.
+        # Budgets are read through the module so overrides set on MenuScrape at runtime apply here too
+        court_retries = MenuScrape.COURT_RETRIES
+        for attempt in range(court_retries + 1):
+            async with semaphore:
+                court_name, court_data = await loop.run_in_executor(executor, scrape)
+            if not court_needs_retry(court_data) or attempt == court_retries:
+                return court_name, court_data
+            print(f"[{court} - {meal_time.capitalize()}] Failed for {date}, retrying ({attempt + 1}/{court_retries})")
+            await asyncio.sleep(MenuScrape.RETRY_BACKOFF * 2 ** attempt)
+
+    tasks = {}
+    for (meal_time, date), courts in groups.items():
+        for court in courts:
+            task = asyncio.ensure_future(run_unit(court, meal_time, date))
+            tasks[task] = (court, meal_time, date)
+    total = len(tasks)
+    print(f"Backfilling {len(groups)} meal/date files ({total} court units) with concurrency {concurrency} ({engine} engine)...")
+
+    files = []
+    completed = 0
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                court, meal_time, date = tasks[task]
+                try:
+                    court_name, court_data = task.result()
+                except Exception as e:
+                    print(f"[{court} - {meal_time.capitalize()}] Backfill unit for {date} failed: {e}")
+                    court_name = court
+                    court_data = {'dining_court': court, 'meal_time': meal_time, 'date': date, 'stations': {}, 'total_items': 0, 'error': str(e)}
+                completed += 1
+                group = groups[(meal_time, date)]
+                group[court_name] = court_data
+                print(f"*** {court_name} {meal_time.capitalize()} {date} FINISHED! ({completed}/{total} units complete) ***")
+                # Write each file as soon as its last court lands, same layout as the SCRAPE_* env-var mode
+                if all(data is not None for data in group.values()):
+                    filepath = write_meal_output(group, meal_time, date, out_dir)
+                    files.append(filepath)
+                    print(f"Data saved to {filepath}")
+                    checkpoint = group_checkpoints.pop((meal_time, date), None)
+                    if checkpoint is not None:
+                        clean = not any(court_needs_retry(data) or checkpoint.failed_items(name) for name, data in group.items())
+                        checkpoint.close(remove=clean)
+                    if columnar:
+                        print(f"Nutrient store saved to {export_nutrient_store(filepath)}")
+    finally:
+        executor.shutdown(wait=True)
+        for checkpoint in group_checkpoints.values():
+            checkpoint.close()
+    return files
+
+
+if __name__ == "__main__":
+    # SCRAPE_BACKFILL_START / SCRAPE_BACKFILL_END: YYYY/MM/DD (inclusive)
+    # SCRAPE_BACKFILL_MEALS: comma-separated meal times (default breakfast,lunch,dinner)
+    # SCRAPE_CONCURRENCY: max (court, meal, date) units in flight; SCRAPE_RATE_LIMIT: requests/sec per host
+    # SCRAPE_BACKFILL_OVERWRITE=1 re-scrapes dates that already have an output file (one with a leftover checkpoint is always resumed)
+    # SCRAPE_COLUMNAR=1 also writes a NutrientStore next to each JSON file
+    # SCRAPE_CHECKPOINT=off disables per-file checkpoints (a rerun otherwise resumes interrupted files)
+    start_date = os.environ.get('SCRAPE_BACKFILL_START')
+    if not start_date:
+        start_date = input("Enter start date (YYYY/MM/DD): ").strip()
+    end_date = os.environ.get('SCRAPE_BACKFILL_END') or start_date
+    meal_times = [m.strip().lower() for m in os.environ.get('SCRAPE_BACKFILL_MEALS', 'breakfast,lunch,dinner').split(',')]
+    meal_times = [m for m in meal_times if m in VALID_MEAL_TIMES] or ['lunch']
+    concurrency = max(1, int(os.environ.get('SCRAPE_CONCURRENCY', '4')))
+    if os.environ.get('SCRAPE_RATE_LIMIT'):
+        rate_limiter.set_rate(float(os.environ['SCRAPE_RATE_LIMIT']))
+    skip_existing = not env_flag('SCRAPE_BACKFILL_OVERWRITE')
+    columnar = env_flag('SCRAPE_COLUMNAR')
+    out_dir = os.environ.get('SCRAPE_OUTPUT_DIR')
+    checkpoints = env_flag('SCRAPE_CHECKPOINT', default=True)
+
+    files = asyncio.run(backfill_date_range(
+        start_date, end_date, meal_times, concurrency,
+        out_dir=out_dir, skip_existing=skip_existing, columnar=columnar, checkpoints=checkpoints
+    ))
+    print(json.dumps({"ok": True, "files": files, "meal_times": meal_times}))
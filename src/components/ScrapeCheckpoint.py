@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from Settings import sibling_path
+
+CHECKPOINT_SUFFIX = '.checkpoint.jsonl'
+
+
+def get_checkpoint_path(json_file_path: str) -> str:
+    return sibling_path(json_file_path, CHECKPOINT_SUFFIX)
+
+
+class ScrapeCheckpoint:
+    # Append-only log of finished units for one output file: an 'item' record per (court, item) with nutrition,
+    # and a 'court' record once a court finished with nothing left to retry. A rerun replays the log and
+    # only fetches what is missing
+    def __init__(self, path: str):
+        self.path = path
+        self.items: Dict[tuple, Dict] = {}
+        self.courts: Dict[str, Dict] = {}
+        self.failed: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._replay()
+        self.resumed = bool(self.items or self.courts)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _replay(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # A torn last line from a crash is ignored; that unit is simply fetched again
+                if not line.endswith('\n'):
+                    break
+                record = json.loads(line)
+                if record['type'] == 'item':
+                    self.items[(record['court'], record['nutrition_url'])] = record['nutrition']
+                elif record['type'] == 'court':
+                    self.courts[record['court']] = record['data']
+
+    def _append(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def get_item(self, court_name: str, nutrition_url: str) -> Optional[Dict]:
+        with self._lock:
+            return self.items.get((court_name, nutrition_url))
+
+    def put_item(self, court_name: str, nutrition_url: str, nutrition_data: Dict) -> None:
+        with self._lock:
+            self.items[(court_name, nutrition_url)] = nutrition_data
+            self.failed.get(court_name, set()).discard(nutrition_url)
+            self._append({'type': 'item', 'court': court_name, 'nutrition_url': nutrition_url, 'nutrition': nutrition_data})
+
+    def mark_failed(self, court_name: str, nutrition_url: str) -> None:
+        with self._lock:
+            self.failed.setdefault(court_name, set()).add(nutrition_url)
+
+    def failed_items(self, court_name: str) -> int:
+        with self._lock:
+            return len(self.failed.get(court_name, ()))
+
+    def get_court(self, court_name: str) -> Optional[Dict]:
+        with self._lock:
+            return self.courts.get(court_name)
+
+    def put_court(self, court_name: str, court_data: Dict) -> None:
+        with self._lock:
+            self.courts[court_name] = court_data
+            self._append({'type': 'court', 'court': court_name, 'data': court_data})
+
+    def close(self, remove: bool = False) -> None:
+        # remove=True once the output file is written and every court completed cleanly
+        with self._lock:
+            self._file.close()
+            if remove and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,26 @@
+import os
+from typing import Optional
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def parse_flag(value: Optional[str], default: bool = False) -> bool:
+    # Unset, empty or unrecognized values keep the default
+    value = (value or '').strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return default
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    # SCRAPE_STREAM=1 -> True; SCRAPE_CHECKPOINT=off -> False
+    return parse_flag(os.environ.get(name), default)
+
+
+def sibling_path(output_path: str, suffix: str) -> str:
+    # purdue_lunch_2025-09-20.json + '.jsonl' -> purdue_lunch_2025-09-20.jsonl; every file written next to an
+    # output (stream, manifest, checkpoint, store, perf report, change log) is named this way
+    return os.path.splitext(output_path)[0] + suffix